@@ -2,150 +2,226 @@
 # all of the data is ultimately embedded in the initial camera array configuration
 # and the calibration point data. These functions transform those two
 # things into a PointHistory object that can be used to optimize the CaptureVolume
+from itertools import combinations
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 import caliscope.logger
 from caliscope.cameras.camera_array import CameraArray
 from caliscope.packets import FramePacket, PointPacket, SyncPacket
-from caliscope.triangulate.array_stereo_triangulator import ArrayStereoTriangulator
-from caliscope.triangulate.stereo_points_builder import (
-    StereoPointsBuilder,
-    StereoPointsPacket,
-    SynchedStereoPointsPacket,
-)
+from caliscope.triangulate.stereo_points_builder import StereoPointsBuilder
+from caliscope.triangulate.stereo_triangulation import batched_triangulate, stereo_triangulate_all
+from caliscope.triangulate.triangulation import undistort
 
 logger = caliscope.logger.get(__name__)
 
+# size in bytes of each csv block read when streaming point data
+POINT_DATA_BLOCK_SIZE = 64 * 1024 * 1024
+
+# explicit column types for the xy point data so pyarrow can skip type inference
+# and keep the (large) coordinate columns in single precision
+POINT_DATA_SCHEMA = pa.schema(
+    [
+        ("sync_index", pa.int32()),
+        ("port", pa.int8()),
+        ("frame_index", pa.int32()),
+        ("frame_time", pa.float64()),
+        ("point_id", pa.int32()),
+        ("img_loc_x", pa.float32()),
+        ("img_loc_y", pa.float32()),
+        ("obj_loc_x", pa.float32()),
+        ("obj_loc_y", pa.float32()),
+    ]
+)
+
+
+def read_point_data(point_data_path: Path) -> pd.DataFrame:
+    """
+    Load the 2D point data csv with the pyarrow reader using POINT_DATA_SCHEMA
+    """
+    convert_options = pacsv.ConvertOptions(column_types=POINT_DATA_SCHEMA)
+    table = pacsv.read_csv(point_data_path, convert_options=convert_options)
+    return table.to_pandas(self_destruct=True)
+
+
+def iter_point_data_batches(point_data_path: Path, block_size: int = POINT_DATA_BLOCK_SIZE):
+    """
+    Yield the 2D point data as a series of DataFrames that each hold only complete sync indices.
+
+    Rows sharing a sync index may straddle two csv blocks, so the rows of the final sync index
+    in each block are held back and prepended to the next one. This relies on the point data
+    being written out in sync_index order, which is how the recorders produce it.
+    """
+    read_options = pacsv.ReadOptions(block_size=block_size)
+    convert_options = pacsv.ConvertOptions(column_types=POINT_DATA_SCHEMA)
+    reader = pacsv.open_csv(point_data_path, read_options=read_options, convert_options=convert_options)
+
+    carry = None
+    for batch in reader:
+        if batch.num_rows == 0:
+            continue
+
+        batch_data = batch.to_pandas()
+        if carry is not None:
+            batch_data = pd.concat([carry, batch_data], ignore_index=True)
+
+        sync_index = batch_data["sync_index"].to_numpy()
+        tail = sync_index == sync_index[-1]
+        carry = batch_data[tail]
 
-def get_stereotriangulated_table_original(camera_array: CameraArray, point_data_path: Path) -> pd.DataFrame:
+        if not tail.all():
+            yield batch_data[~tail]
+
+    if carry is not None:
+        yield carry
+
+
+def save_stereotriangulated_table(stereotriangulated_table: pd.DataFrame, directory: Path, debug_format: str):
+    """
+    Write the stereotriangulated points out for inspection as either "parquet" or "csv"
+    """
+    output_path = Path(directory, f"stereotriangulated_points.{debug_format}")
+    logger.info(f"Saving {output_path.name} to {directory} for inspection")
+
+    if debug_format == "parquet":
+        stereotriangulated_table.to_parquet(output_path, compression="snappy", index=False)
+    elif debug_format == "csv":
+        stereotriangulated_table.to_csv(output_path, index=False)
+    else:
+        raise ValueError(f"Unsupported debug_format: {debug_format}")
+
+
+def _stereotriangulate_point_data(
+    point_data: pd.DataFrame, camera_array: CameraArray, ports: list
+) -> pd.DataFrame | None:
+    """
+    Triangulate every camera pair at each sync index within a block of point data, returning the
+    stereotriangulated points as a DataFrame (or None if nothing was triangulated)
+    """
+    # only cameras in the array are triangulated; map each to a contiguous index
+    point_data = point_data[point_data["port"].isin(ports)]
+    if point_data.empty:
+        return None
+
+    port_lookup = np.full(max(ports) + 1, -1, dtype=np.int64)
+    port_lookup[ports] = np.arange(len(ports))
+    pairs = list(combinations(ports, 2))
+    pair_table = np.array([(ports.index(i), ports.index(j)) for i, j in pairs], dtype=np.int64).reshape(-1, 2)
+
+    sync_index = point_data["sync_index"].to_numpy().astype(np.int64)
+    port_index = port_lookup[point_data["port"].to_numpy()]
+    point_id = point_data["point_id"].to_numpy().astype(np.int64)
+    img_loc = np.column_stack((point_data["img_loc_x"].to_numpy(), point_data["img_loc_y"].to_numpy()))
+
+    # the kernel expects rows sorted by (sync_index, port, point_id)
+    order = np.lexsort((point_id, port_index, sync_index))
+    sync_index = sync_index[order]
+    port_index = port_index[order]
+    point_id = point_id[order]
+    img_loc = img_loc[order]
+
+    # single precision throughout; ample for pixel coordinates and half the memory traffic
+    img_xy = np.empty(img_loc.shape, dtype=np.float32)
+    for index, port in enumerate(ports):
+        on_port = port_index == index
+        img_xy[on_port] = undistort(img_loc[on_port], camera_array.cameras[port]).T
+
+    projection_matrices = np.stack([camera_array.cameras[port].projection_matrix for port in ports]).astype(np.float32)
+
+    sync_breaks = np.flatnonzero(np.diff(sync_index)) + 1
+    sync_starts = np.r_[0, sync_breaks].astype(np.int64)
+    sync_stops = np.r_[sync_breaks, len(sync_index)].astype(np.int64)
+
+    logger.info(
+        f"Processing stereotriangulation estimates for sync indices {sync_index[0]} to {sync_index[-1]}..."
+    )
+    row_A, row_B, pair_index, xyz = stereo_triangulate_all(
+        sync_starts, sync_stops, port_index, point_id, img_xy, projection_matrices, pair_table
+    )
+
+    if len(row_A) == 0:
+        return None
+
+    # computed in single precision, but handed back in the int64/float64 columns callers have always had
+    xyz = xyz.astype(np.float64)
+    return pd.DataFrame(
+        {
+            "pair": [pairs[k] for k in pair_index.tolist()],
+            "port_A": np.array(ports, dtype=np.int64)[pair_table[pair_index, 0]],
+            "port_B": np.array(ports, dtype=np.int64)[pair_table[pair_index, 1]],
+            "sync_index": sync_index[row_A],
+            "point_id": point_id[row_A],
+            "x_pos": xyz[:, 0],
+            "y_pos": xyz[:, 1],
+            "z_pos": xyz[:, 2],
+            "x_A": img_loc[row_A, 0].astype(np.float64),
+            "y_A": img_loc[row_A, 1].astype(np.float64),
+            "x_B": img_loc[row_B, 0].astype(np.float64),
+            "y_B": img_loc[row_B, 1].astype(np.float64),
+        }
+    )
+
+
+def get_stereotriangulated_table_original(
+    camera_array: CameraArray, point_data_path: Path, save_debug: bool = True, debug_format: str = "parquet"
+) -> pd.DataFrame:
     """
     Creates a table of stereotriangulated points from 2D point data stored in a CSV file.
 
     This function:
-    1. Loads 2D point data from a CSV file
-    2. Processes all sync indices to find point correspondences between camera pairs
-    3. Triangulates corresponding points to get 3D coordinates
+    1. Streams 2D point data from a CSV file in blocks of complete sync indices
+    2. Finds point correspondences between camera pairs at each sync index of a block
+    3. Triangulates corresponding points to get 3D coordinates (jit compiled, parallel over sync indices)
     4. Returns a DataFrame with the triangulated points data
 
+    Only one block of the input is held in memory at a time.
+
     Args:
         camera_array: Contains camera parameters used for triangulation
         point_data_path: Path to the CSV file containing 2D point data
+        save_debug: write the table next to the point data for inspection
+        debug_format: "parquet" (default) or "csv"
 
     Returns:
         pd.DataFrame: Table containing triangulated 3D points
     """
     logger.info(f"Beginning to create stereotriangulated points from data stored at {point_data_path}")
-    point_data = pd.read_csv(point_data_path)
-
-    xy_sync_indices = point_data["sync_index"].to_numpy()
-    sync_indices = np.unique(xy_sync_indices)
 
     ports = [key for key in camera_array.port_index.keys()]
 
-    # Pre-group data by sync_index to avoid repeated filtering operations
-    # This creates a dictionary where keys are sync_indices and values are DataFrame subsets
-    # Much more efficient than repeatedly filtering with point_data.query() in the loop
-    sync_groups = {}
-    for sync_index in sync_indices:
-        # Create boolean mask for this sync_index (faster than .loc or .query)
-        mask = point_data["sync_index"] == sync_index
-        # Use the mask to get data for this sync_index
-        sync_groups[sync_index] = point_data[mask]
+    # sync indices are triangulated in parallel within the compiled kernel
+    logger.info("Begin stereotriangulation...due to jit, first round of calculations may take a moment.")
 
-    paired_point_builder = StereoPointsBuilder(ports)
+    batch_tables = []
+    for point_data in iter_point_data_batches(point_data_path):
+        batch_table = _stereotriangulate_point_data(point_data, camera_array, ports)
+        if batch_table is not None:
+            batch_tables.append(batch_table)
+
+    if batch_tables:
+        stereotriangulated_table = pd.concat(batch_tables, ignore_index=True)
+    else:
+        stereotriangulated_table = pd.DataFrame()
 
-    # Create the infrastructure for the pairwise triangulation
-    array_triangulator = ArrayStereoTriangulator(camera_array)
-    stereotriangulated_table = None
-
-    # Calculate total number of sync indices for progress reporting
-    total_sync_indices = len(sync_indices)
-
-    logger.info("Begin reconstructing SyncPackets and SynchedStereoPairs... ")
-
-    for i, sync_index in enumerate(sync_indices):
-        # Report progress every 25 sync indices
-        if i % 25 == 0:
-            # More detailed progress report with percentage complete
-            logger.info(
-                            f"Processing stereotriangulation estimates...  {i}/{total_sync_indices} "
-                            f"({i/total_sync_indices*100:.1f}%)"
-                        )
-
-        # Get pre-filtered data for this sync_index
-        # This is faster than filtering the entire dataset each time
-        port_points = sync_groups[sync_index]
-
-        # initialize a dict to hold all the frame packets
-        frame_packets = {}
-
-
-        # Create frame packet for each port
-        for port in ports:
-            # Filter points for this port using boolean mask
-            # This is faster than chained .loc operations
-            port_mask = port_points["port"] == port
-            port_data = port_points[port_mask]
-
-            # Only create frame packet if there are points for this port
-            if not port_data.empty:
-                # Extract metadata - these are scalar values so iloc[0] is appropriate
-                frame_time = port_data["frame_time"].iloc[0]
-                frame_index = port_data["frame_index"].iloc[0]
-
-                point_id = port_data["point_id"].to_numpy()
-
-                img_loc_x = port_data["img_loc_x"].to_numpy()
-                img_loc_y = port_data["img_loc_y"].to_numpy()
-                img_loc = np.vstack([img_loc_x, img_loc_y]).T
-
-                obj_loc_x = port_data["obj_loc_x"].to_numpy()
-                obj_loc_y = port_data["obj_loc_y"].to_numpy()
-                obj_loc = np.vstack([obj_loc_x, obj_loc_y]).T
-
-                point_packet = PointPacket(point_id, img_loc, obj_loc)
-                frame_packet = FramePacket(
-                    port=port,
-                    frame_index=frame_index,
-                    frame_time=frame_time,
-                    frame=None,
-                    points=point_packet,
-                )
-                frame_packets[port] = frame_packet
-            else:
-                frame_packets[port] = None
-
-        # create the sync packet for this sync index
-        sync_packet = SyncPacket(sync_index, frame_packets)
-
-        # get the paired point packets for all port pairs at this sync index
-        synched_stereo_points: SynchedStereoPointsPacket = paired_point_builder.get_synched_paired_points(sync_packet)
-        # print(synched_paired_points)
-        array_triangulator.triangulate_synched_points(synched_stereo_points)
-
-        for pair in synched_stereo_points.pairs:
-            triangulated_pair: StereoPointsPacket = synched_stereo_points.stereo_points_packets[pair]
-            if triangulated_pair is not None:
-                if stereotriangulated_table is None:
-                    stereotriangulated_table = triangulated_pair.to_table()
-                else:
-                    new_table = triangulated_pair.to_table()
-                    for key, value in new_table.items():
-                        stereotriangulated_table[key].extend(value)
-
-    logger.info(f"Saving stereotriangulated_points.csv to {point_data_path.parent} for inspection")
-    stereotriangulated_table = pd.DataFrame(stereotriangulated_table)
-    stereotriangulated_table.to_csv(Path(point_data_path.parent, "stereotriangulated_points.csv"))
+    if save_debug:
+        save_stereotriangulated_table(stereotriangulated_table, point_data_path.parent, debug_format)
 
     logger.info("Returning dataframe of stereotriangulated points to caller")
 
     return stereotriangulated_table
 
 
-def get_stereotriangulated_table(camera_array: CameraArray, point_data_path: Path) -> pd.DataFrame:
+def get_stereotriangulated_table(
+    camera_array: CameraArray,
+    point_data_path: Path,
+    backend: str = "cpu",
+    save_debug: bool = True,
+    debug_format: str = "parquet",
+) -> pd.DataFrame:
     """
     Creates a table of stereotriangulated points from 2D point data stored in a CSV file.
     - processing all sync indices at once.
@@ -159,48 +235,43 @@ def get_stereotriangulated_table(camera_array: CameraArray, point_data_path: Pat
     Args:
         camera_array: Contains camera parameters used for triangulation
         point_data_path: Path to the CSV file containing 2D point data
+        backend: "cpu" or "cuda"; "cuda" runs the batched triangulation on the GPU when
+            torch and a CUDA device are available, and falls back to the CPU otherwise
+        save_debug: write the table next to the point data for inspection
+        debug_format: "parquet" (default) or "csv"
 
     Returns:
         pd.DataFrame: Table containing triangulated 3D points
     """
     logger.info(f"Beginning to create stereotriangulated points from data stored at {point_data_path}")
-    point_data = pd.read_csv(point_data_path)
+    point_data = read_point_data(point_data_path)
 
-    # Store original values
-    point_data['original_sync_index'] = point_data['sync_index']
-    point_data['original_point_id'] = point_data['point_id']
-
-    # Create unique point IDs by combining sync_index and point_id
+    # every sync index is pooled into a single virtual frame; sync_index is carried alongside
+    # point_id so that correspondences are still matched within their own sync index
     logger.info("Converting point_data to mimic 'single sync index' format")
-    max_point_id = point_data['point_id'].max()
-    point_id_multiplier = max_point_id + 1
-    point_data['point_id'] = point_data['sync_index'] * point_id_multiplier + point_data['point_id']
-
-    # Set all sync indices to 0 (treating all points as from the same virtual frame)
-    point_data['sync_index'] = 0
 
     ports = [key for key in camera_array.port_index.keys()]
 
+    # Split the table by port in a single pass rather than masking once per port
+    port_groups = dict(tuple(point_data.groupby('port', sort=False)))
+
     # Process all cameras and points at once
     frame_packets = {}
     for port in ports:
         logger.info(f"Creating data for port {port}")
-        port_data = point_data[point_data['port'] == port]
-        if not port_data.empty:
+        port_data = port_groups.get(port)
+        if port_data is not None and not port_data.empty:
             # Use any frame time since we're combining all frames
-            frame_time = port_data['frame_time'].iloc[0]
+            frame_time = port_data['frame_time'].iat[0]
             frame_index = 0
 
             point_id = port_data['point_id'].to_numpy()
-            img_loc_x = port_data['img_loc_x'].to_numpy()
-            img_loc_y = port_data['img_loc_y'].to_numpy()
-            img_loc = np.vstack([img_loc_x, img_loc_y]).T
-
-            obj_loc_x = port_data['obj_loc_x'].to_numpy()
-            obj_loc_y = port_data['obj_loc_y'].to_numpy()
-            obj_loc = np.vstack([obj_loc_x, obj_loc_y]).T
+            sync_index = port_data['sync_index'].to_numpy()
+            # build C-contiguous (N,2) arrays directly; vstack(...).T hands back a strided view
+            img_loc = np.column_stack((port_data['img_loc_x'].to_numpy(), port_data['img_loc_y'].to_numpy()))
+            obj_loc = np.column_stack((port_data['obj_loc_x'].to_numpy(), port_data['obj_loc_y'].to_numpy()))
 
-            point_packet = PointPacket(point_id, img_loc, obj_loc)
+            point_packet = PointPacket(point_id, img_loc, obj_loc, sync_index=sync_index)
             frame_packet = FramePacket(
                 port=port,
                 frame_index=frame_index,
@@ -215,36 +286,67 @@ def get_stereotriangulated_table(camera_array: CameraArray, point_data_path: Pat
     # Single triangulation pass for all points
     sync_packet = SyncPacket(0, frame_packets)
     paired_point_builder = StereoPointsBuilder(ports)
-    array_triangulator = ArrayStereoTriangulator(camera_array)
 
     synched_stereo_points = paired_point_builder.get_synched_paired_points(sync_packet)
-    array_triangulator.triangulate_synched_points(synched_stereo_points)
-
-    # Collect and process results
-    stereotriangulated_table = None
-    for pair in synched_stereo_points.pairs:
-        triangulated_pair = synched_stereo_points.stereo_points_packets[pair]
-        if triangulated_pair is not None:
-            if stereotriangulated_table is None:
-                stereotriangulated_table = triangulated_pair.to_table()
-            else:
-                new_table = triangulated_pair.to_table()
-                for key, value in new_table.items():
-                    stereotriangulated_table[key].extend(value)
-
-    # Convert to DataFrame and restore original values
-    stereotriangulated_table = pd.DataFrame(stereotriangulated_table)
-
-    # Decompose combined point_id back to original sync_index and point_id
-    stereotriangulated_table['original_sync_index'] = stereotriangulated_table['point_id'] // point_id_multiplier
-    stereotriangulated_table['original_point_id'] = stereotriangulated_table['point_id'] % point_id_multiplier
-
-    # Update to original values
-    stereotriangulated_table['sync_index'] = stereotriangulated_table['original_sync_index']
-    stereotriangulated_table['point_id'] = stereotriangulated_table['original_point_id']
-    stereotriangulated_table.drop(['original_sync_index', 'original_point_id'], axis=1, inplace=True)
-
-    logger.info(f"Saving stereotriangulated_points.csv to {point_data_path.parent}")
-    stereotriangulated_table.to_csv(Path(point_data_path.parent, "stereotriangulated_points.csv"))
+    stereo_packets = [packet for packet in synched_stereo_points.stereo_points_packets.values() if packet is not None]
+
+    # stack the correspondences of every camera pair so they are all triangulated in one batched call
+    # coordinates and projections are kept in single precision, well above the noise floor of the
+    # 2D point estimates, which halves the memory traffic of building and solving the stacked systems
+    logger.info("Triangulating points in common across all camera pairs")
+    cameras = camera_array.cameras
+    pairs = paired_point_builder.pairs
+    # projection matrices of both cameras of every pair, gathered per point by pair index
+    P_pairs = np.stack(
+        [np.stack([cameras[a].projection_matrix, cameras[b].projection_matrix]) for a, b in pairs]
+    ).astype(np.float32)
+    point_counts = [len(packet.common_ids) for packet in stereo_packets]
+    total = sum(point_counts)
+
+    # the number of correspondences is known once pairs are matched, so every column is allocated
+    # once at its final length and filled pair by pair rather than grown and concatenated
+    pair_index = np.empty(total, dtype=np.int64)
+    sync_index = np.empty(total, dtype=point_data["sync_index"].dtype)
+    point_id = np.empty(total, dtype=point_data["point_id"].dtype)
+    img_loc_A = np.empty((total, 2), dtype=np.float32)
+    img_loc_B = np.empty((total, 2), dtype=np.float32)
+    xy_A = np.empty((total, 2), dtype=np.float32)
+    xy_B = np.empty((total, 2), dtype=np.float32)
+
+    cursor = 0
+    for packet, count in zip(stereo_packets, point_counts):
+        stop = cursor + count
+        pair_index[cursor:stop] = pairs.index(packet.pair)
+        sync_index[cursor:stop] = packet.sync_index
+        point_id[cursor:stop] = packet.common_ids
+        img_loc_A[cursor:stop] = packet.img_loc_A
+        img_loc_B[cursor:stop] = packet.img_loc_B
+        xy_A[cursor:stop] = undistort(packet.img_loc_A, cameras[packet.port_A]).T
+        xy_B[cursor:stop] = undistort(packet.img_loc_B, cameras[packet.port_B]).T
+        cursor = stop
+
+    # computed in single precision, but handed back in the int64/float64 columns callers have always had
+    xyz = batched_triangulate(xy_A, xy_B, pair_index, P_pairs, backend=backend).astype(np.float64)
+
+    pair_ports = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    stereotriangulated_table = pd.DataFrame(
+        {
+            "pair": [pairs[k] for k in pair_index.tolist()],
+            "port_A": pair_ports[pair_index, 0],
+            "port_B": pair_ports[pair_index, 1],
+            "sync_index": sync_index.astype(np.int64),
+            "point_id": point_id.astype(np.int64),
+            "x_pos": xyz[:, 0],
+            "y_pos": xyz[:, 1],
+            "z_pos": xyz[:, 2],
+            "x_A": img_loc_A[:, 0].astype(np.float64),
+            "y_A": img_loc_A[:, 1].astype(np.float64),
+            "x_B": img_loc_B[:, 0].astype(np.float64),
+            "y_B": img_loc_B[:, 1].astype(np.float64),
+        }
+    )
+
+    if save_debug:
+        save_stereotriangulated_table(stereotriangulated_table, point_data_path.parent, debug_format)
 
     return stereotriangulated_table
@@ -141,7 +141,7 @@ class QualityController:
     @property
     def corners_board_xyz(self) -> np.ndarray:
         corner_ids = self.corners_world_xyz["charuco_id"]
-        corners_board_xyz = self.charuco.board.getChessboardCorners()[corner_ids]
+        corners_board_xyz = self.charuco.chessboard_corners[corner_ids]
 
         return corners_board_xyz
 
@@ -60,7 +60,7 @@ def get_board_corners_xyz(point_estimates: PointEstimates, sync_index: int, char
     unique_charuco_id = np.unique(charuco_ids)
     unique_charuco_id.sort()
 
-    board_corners_xyz = charuco.board.getChessboardCorners()[unique_charuco_id]
+    board_corners_xyz = charuco.chessboard_corners[unique_charuco_id]
     return board_corners_xyz
 
 
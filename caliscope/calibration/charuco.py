@@ -5,11 +5,12 @@
 # in meters as a standard convention of science, and to improve
 # readability of 3D positional output downstream
 
-from collections import defaultdict
-from itertools import combinations
+from dataclasses import asdict, dataclass
+from functools import lru_cache
 import os
 
 import cv2
+import numpy as np
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QImage, QPixmap
 from reportlab.pdfgen import canvas
@@ -20,41 +21,30 @@ import caliscope.logger
 
 logger = caliscope.logger.get(__name__)
 
+@dataclass(slots=True)
 class Charuco:
     """
     create a charuco board that can be printed out and used for camera
     calibration, and used for drawing a grid during calibration
+
+    All measurements are in millimeters (mm)
+
+    columns - number of columns in the board
+    rows - number of rows in the board
+    square_marker_size_mm - width of a checker square in mm
+    dictionary - ArUco dictionary to use
+    aruco_scale - scale of ArUco markers relative to checker size
+    inverted - whether to invert colors
+
+    Not frozen as the config tests edit boards in place; derived values are cached on the parameters.
     """
 
-    def __init__(
-        self,
-        columns,
-        rows,
-        square_marker_size_mm,
-        dictionary="DICT_4X4_50",
-        aruco_scale=0.75,
-        inverted=False,
-    ):
-        """
-        Create board based on shape and dimensions
-        All measurements are in millimeters (mm)
-        
-        Parameters:        board_height_mm - height of the board in mm
-        board_width_mm - width of the board in mm
-        checker_width_mm - width of a checker square in mm (calculated from board dimensions if None)
-        columns - number of columns in the board
-        rows - number of rows in the board
-        dictionary - ArUco dictionary to use
-        aruco_scale - scale of ArUco markers relative to checker size
-        inverted - whether to invert colors
-        legacy_pattern - whether to use legacy pattern
-        """
-        self.columns = columns
-        self.rows = rows
-        self.square_marker_size_mm = square_marker_size_mm 
-        self.dictionary = dictionary
-        self.aruco_scale = aruco_scale
-        self.inverted = inverted
+    columns: int
+    rows: int
+    square_marker_size_mm: float
+    dictionary: str = "DICT_4X4_50"
+    aruco_scale: float = 0.75
+    inverted: bool = False
 
     @property
     def dictionary_object(self):
@@ -64,15 +54,18 @@ class Charuco:
 
     @property
     def board(self):
-        marker_length = self.square_marker_size_mm * self.aruco_scale
-        # create the board
-        board = cv2.aruco.CharucoBoard(size=(self.columns, self.rows),
-                                      squareLength=self.square_marker_size_mm,
-                                      markerLength=marker_length,
-                                      dictionary=self.dictionary_object,
-        )
+        # boards are cached on the parameters (rather than on the instance) so that
+        # edits to a Charuco are picked up
+        return _build_board(self.columns, self.rows, self.square_marker_size_mm, self.dictionary, self.aruco_scale)
 
-        return board
+    @property
+    def chessboard_corners(self):
+        """
+        (N,3) array of the board's chessboard corner positions; shared and read-only
+        """
+        return _get_chessboard_corners(
+            self.columns, self.rows, self.square_marker_size_mm, self.dictionary, self.aruco_scale
+        )
 
     def board_img(self, pixmap_scale=1000):
         """
@@ -81,29 +74,31 @@ class Charuco:
         provide larger pixmap_scale to get printer-ready image
         """
 
-        ratio = self.columns / self.rows
-        img = self.board.generateImage((pixmap_scale, int(pixmap_scale * ratio)))
-        if self.inverted:
-            img = ~img
-
-        return img
+        # cached as GUI resizes request the same image over and over; the array is shared and read-only
+        return _generate_board_img(
+            self.columns,
+            self.rows,
+            self.dictionary,
+            self.aruco_scale,
+            self.inverted,
+            pixmap_scale,
+        )
 
     def board_pixmap(self, width, height):
         """
         Convert from an opencv image to QPixmap
         this can be used for creating thumbnail images
         """
-        rgb_image = cv2.cvtColor(self.board_img(), cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        charuco_QImage = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        p = charuco_QImage.scaled(
+        p = _generate_board_thumbnail(
+            self.columns,
+            self.rows,
+            self.dictionary,
+            self.aruco_scale,
+            self.inverted,
             width,
             height,
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation,
         )
-        return QPixmap.fromImage(charuco_QImage)
+        return QPixmap.fromImage(p)
 
     # def save_pdf(self, path):
     #     """
@@ -239,44 +234,40 @@ class Charuco:
         a grid pattern. This will provide the "object points" used by the calibration
         functions. It is the ground truth of how the points relate in the world.
 
-        The return value is a *set* not a list
+        The return value is a *frozenset* not a list
         """
-        # create sets of the vertical and horizontal line positions
-        corners = self.board.getChessboardCorners()
-        corners_x = corners[:, 0]
-        corners_y = corners[:, 1]
-        x_set = set(corners_x)
-        y_set = set(corners_y)
-
-        lines = defaultdict(list)
-
-        # put each point on the same vertical line in a list
-        for x_line in x_set:
-            for corner, x, y in zip(range(0, len(corners)), corners_x, corners_y):
-                if x == x_line:
-                    lines[f"x_{x_line}"].append(corner)
-
-        # and the same for each point on the same horizontal line
-        for y_line in y_set:
-            for corner, x, y in zip(range(0, len(corners)), corners_x, corners_y):
-                if y == y_line:
-                    lines[f"y_{y_line}"].append(corner)
-
-        # create a set of all sets of corner pairs that should be connected
-        connected_corners = set()
-        for lines, corner_ids in lines.items():
-            for i in combinations(corner_ids, 2):
-                connected_corners.add(i)
-
-        return connected_corners
-
-    def get_object_corners(self, corner_ids):
+        corners = self.chessboard_corners
+        pair_blocks = [np.empty((0, 2), dtype=np.intp)]
+
+        # corners that share an x position form a vertical line, and those sharing
+        # a y position form a horizontal line. Sort each coordinate once and
+        # split at the positions where its value changes to get those lines
+        for axis in (0, 1):
+            coords = corners[:, axis]
+            order = np.argsort(coords, kind="stable")
+            breaks = np.flatnonzero(np.diff(coords[order])) + 1
+
+            for line in np.split(order, breaks):
+                # every pair of corners along a line gets connected
+                i, j = np.triu_indices(line.size, k=1)
+                pair_blocks.append(np.column_stack((line[i], line[j])))
+
+        # order each pair so (a,b) and (b,a) collapse to one entry
+        connected_corners = np.concatenate(pair_blocks)
+        connected_corners.sort(axis=1)
+        connected_corners = np.unique(connected_corners, axis=0)
+
+        return frozenset(map(tuple, connected_corners.tolist()))
+
+    def get_object_corners(self, corner_ids, out=None):
         """
-        Given an array of corner IDs, provide an array of their relative
+        Given an array (or list) of corner IDs, provide an array of their relative
         position in a board frame of reference, originating from a corner position.
-        """
 
-        return self.board.chessboardCorners()[corner_ids, :]
+        out - optional (len(corner_ids),3) array to write the positions into
+        """
+        corner_ids = np.asarray(corner_ids, dtype=np.intp).ravel()
+        return np.take(self.chessboard_corners, corner_ids, axis=0, out=out)
 
     def summary(self):
         text = f"Columns: {self.columns}\n"
@@ -288,6 +279,60 @@ class Charuco:
         return text
 
 
+@lru_cache(maxsize=16)
+def _build_board(columns, rows, square_marker_size_mm, dictionary, aruco_scale):
+    marker_length = square_marker_size_mm * aruco_scale
+    dictionary_object = cv2.aruco.getPredefinedDictionary(ARUCO_DICTIONARIES[dictionary])
+    # create the board
+    board = cv2.aruco.CharucoBoard(size=(columns, rows),
+                                  squareLength=square_marker_size_mm,
+                                  markerLength=marker_length,
+                                  dictionary=dictionary_object,
+    )
+
+    return board
+
+
+@lru_cache(maxsize=16)
+def _get_chessboard_corners(columns, rows, square_marker_size_mm, dictionary, aruco_scale):
+    board = _build_board(columns, rows, square_marker_size_mm, dictionary, aruco_scale)
+    corners = board.getChessboardCorners()
+    # the same array is handed to every caller, so guard against in-place edits
+    corners.setflags(write=False)
+    return corners
+
+
+# The raster only depends on the ratio of marker to square, not on their physical size, so it is
+# keyed without it: the display thumbnail and a saved board of any square size share one image
+@lru_cache(maxsize=4)
+def _generate_board_img(columns, rows, dictionary, aruco_scale, inverted, pixmap_scale):
+    board = _build_board(columns, rows, 1, dictionary, aruco_scale)
+    ratio = columns / rows
+    img = board.generateImage((pixmap_scale, int(pixmap_scale * ratio)))
+    if inverted:
+        img = ~img
+
+    img.setflags(write=False)
+    return img
+
+
+# thumbnails are small, so keep enough of them to cover going back and forth between settings.
+# A new display size only rescales the cached raster
+@lru_cache(maxsize=32)
+def _generate_board_thumbnail(columns, rows, dictionary, aruco_scale, inverted, width, height):
+    # the board is single channel, so hand it to Qt as grayscale without an RGB copy
+    img = _generate_board_img(columns, rows, dictionary, aruco_scale, inverted, 1000)
+    h, w = img.shape[:2]
+    charuco_QImage = QImage(img.data, w, h, img.strides[0], QImage.Format.Format_Grayscale8)
+    # scaled() returns an image with its own copy of the pixels, so it does not depend on img
+    return charuco_QImage.scaled(
+        width,
+        height,
+        Qt.AspectRatioMode.KeepAspectRatio,
+        Qt.TransformationMode.SmoothTransformation,
+    )
+
+
 ################################## REFERENCE ###################################
 ARUCO_DICTIONARIES = {
     "DICT_4X4_50": cv2.aruco.DICT_4X4_50,
@@ -327,10 +372,10 @@ if __name__ == "__main__":
     width, height = charuco.board_img().shape
     logger.info(f"Board width is {width}\nBoard height is {height}")
 
-    corners = charuco.board.getChessboardCorners()
+    corners = charuco.chessboard_corners
     logger.info(corners)
 
-    logger.info(f"Charuco dictionary: {charuco.__dict__}")
+    logger.info(f"Charuco dictionary: {asdict(charuco)}")
     # while True:
     #     cv2.imshow("Charuco Board...'q' to quit", charuco.board_img)
     #     #
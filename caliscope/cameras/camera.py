@@ -35,6 +35,9 @@ class Camera:
     # https://docs.opencv.org/3.4/d4/d15/group__videoio__flags__base.html
     # see above for constants used to access properties
     def __init__(self, port, verified_resolutions=None, connect_API=None):
+        # filled by the first get_all_available_resolutions() call
+        self._available_resolutions = None
+
         if connect_API is not None:
             self.connect_API = connect_API
         else:
@@ -241,9 +244,15 @@ class Camera:
         Test all common resolutions to find which ones are supported by this camera.
         This is a more comprehensive check than set_possible_resolutions().
         
+        The probe reconnects the camera for every candidate, so its result is kept and
+        later calls return it straight away.
+
         Returns:
             list: List of supported resolutions as (width, height) tuples
         """
+        if self._available_resolutions is not None:
+            return list(self._available_resolutions)
+
         logger.info(f"Checking all available resolutions for camera {self.port}")
         
         # Store original resolution to restore later
@@ -287,7 +296,12 @@ class Camera:
         self.size = original_resolution
         
         logger.info(f"Camera {self.port} has {len(available_resolutions)} available resolutions")
-        return available_resolutions
+        self._available_resolutions = available_resolutions
+        return list(available_resolutions)
+
+    @property
+    def available_resolutions_known(self) -> bool:
+        return self._available_resolutions is not None
 
     def calibration_summary(self):
         # Calibration output presented in label on far right
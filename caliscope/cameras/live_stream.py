@@ -3,20 +3,117 @@
 # that reads in frames.
 
 
+import logging
+import os
+from bisect import bisect_right
+from dataclasses import replace
+
 import caliscope.logger
 
 from time import perf_counter, sleep
-from queue import Queue
-from threading import Thread, Event
+from threading import Condition, Event, Thread
 
 import cv2
-import numpy as np
 
 from caliscope.cameras.camera import Camera
 from caliscope.interface import FramePacket
 
 logger = caliscope.logger.get(__name__)
 
+# available FPS settings, ascending
+FPS_STEPS = (5, 10, 15, 20, 30)
+
+class SPSCFramePacketQueue:
+    """
+    Single producer / single consumer ring of frame packets, for subscribers (such as a
+    recording) that need every frame rather than the latest one. The producer only ever
+    advances _head and the consumer only _tail, so each side is a plain store and no lock is
+    taken on the hot path. The consumer spins briefly before falling back to an Event wait,
+    which the producer only sets when the consumer is actually asleep.
+
+    When the ring is full the incoming packet is dropped and counted, so a stalled consumer
+    never holds up capture. With block=True the producer instead waits (up to block_timeout_s)
+    for the consumer to make room, trading capture jitter for a complete recording.
+    """
+
+    SPIN_S = 50e-6
+
+    def __init__(self, size: int = 64, block: bool = False, block_timeout_s: float = 1.0):
+        assert size & (size - 1) == 0, "size must be a power of two"
+        self.block = block
+        self.block_timeout_s = block_timeout_s
+        self._ring = [None] * size
+        self._mask = size - 1
+        self._head = 0  # total packets enqueued; written only by the producer
+        self._tail = 0  # total packets dequeued; written only by the consumer
+        self._waiting = False
+        self._not_empty = Event()
+        self._producer_waiting = False
+        self._not_full = Event()
+        self.dropped = 0
+
+    def qsize(self) -> int:
+        return self._head - self._tail
+
+    def enqueue(self, packet: FramePacket) -> bool:
+        """
+        Called by the producer. Returns False (and drops the packet) when the ring is full
+        """
+        if self._head - self._tail > self._mask and self.block:
+            self._not_full.clear()
+            self._producer_waiting = True
+            if self._head - self._tail > self._mask:
+                self._not_full.wait(self.block_timeout_s)
+            self._producer_waiting = False
+
+        if self._head - self._tail > self._mask:
+            self.dropped += 1
+            return False
+        self._ring[self._head & self._mask] = packet
+        self._head += 1  # publishes the slot to the consumer
+        if self._waiting:
+            self._not_empty.set()
+        return True
+
+    def dequeue(self) -> FramePacket | None:
+        """
+        Called by the consumer. Returns None if nothing is queued
+        """
+        if self._tail == self._head:
+            return None
+        slot = self._tail & self._mask
+        packet = self._ring[slot]
+        self._ring[slot] = None  # don't hold on to the frame once consumed
+        self._tail += 1
+        if self._producer_waiting:
+            self._not_full.set()
+        return packet
+
+    def wake(self):
+        """
+        Releases a consumer waiting in dequeue_blocking, e.g. so that it notices a stop right away
+        """
+        self._not_empty.set()
+
+    def dequeue_blocking(self, timeout_ms: float = 100) -> FramePacket | None:
+        """
+        Called by the consumer. Returns None if nothing arrives within the timeout
+        """
+        spin_until = perf_counter() + self.SPIN_S
+        while self._tail == self._head and perf_counter() < spin_until:
+            pass
+
+        if self._tail == self._head:
+            self._not_empty.clear()
+            self._waiting = True
+            # check again after announcing the wait so an enqueue in between is not missed
+            if self._tail == self._head:
+                self._not_empty.wait(timeout_ms / 1000)
+            self._waiting = False
+
+        return self.dequeue()
+
+
 class LiveStream():
     def __init__(self, camera: Camera, fps_target: int = 6):
         self.camera: Camera = camera
@@ -24,17 +121,26 @@ class LiveStream():
 
         self.stop_event = Event()
 
-        # Replace queue-based subscribers with a simple list of subscriber IDs
-        self.subscribers = []  # List of subscriber IDs
-        self.latest_frame_packet = None  # Store the most recent frame packet
-        self.frame_updated = Event()  # Signal when a new frame is available
-
-        # make sure camera no longer reading before trying to change resolution
-        self.stop_confirm = Queue()
-
-        self._show_fps = True  # used for testing
+        # Replace queue-based subscribers with a simple set of subscriber IDs
+        self.subscribers = set()  # Set of subscriber IDs
+        # subscribers that receive every frame packet; replaced rather than mutated
+        # so the worker can iterate it without holding the lock
+        self._queues = ()
+        # the worker sleeps on this while nothing is subscribed; notified on subscribe and stop
+        self._subs_cv = Condition()
+        # double buffer of frame packets: the worker fills the idle slot and then flips _current,
+        # so readers always see a complete packet without taking a lock
+        self._frames = [None, None]
+        self._current = 0
+
+        # consumers wait on this for frame_seq to move past the last frame they saw
+        self._frame_cv = Condition()
+        self._frame_seq = 0  # incremented with each new frame packet
 
         self.set_fps_target(fps_target)
+        # when set, frames between decodes are only grabbed; see set_decode_fps
+        self._decode_period = None
+        self._last_decode = 0.0
         self.FPS_actual = 0
         # Start the thread to read frames from the video stream
         self.thread = Thread(target=self._play_worker, args=(), daemon=True)
@@ -52,78 +158,130 @@ class LiveStream():
 
     def subscribe(self, subscriber_id):
         """
-        Add a subscriber by ID or reference (can be any hashable object)
+        Add a subscriber by ID or reference (can be any hashable object).
+        An SPSCFramePacketQueue subscriber is also handed every frame packet.
         """
-        if subscriber_id not in self.subscribers:
-            logger.info(f"Adding subscriber to stream {self.port}")
-            self.subscribers.append(subscriber_id)
-            logger.info(f"...now {len(self.subscribers)} subscriber(s) at {self.port}, fps_target: {self.fps_target}")
-        else:
+        with self._subs_cv:
+            already_subscribed = subscriber_id in self.subscribers
+            if not already_subscribed:
+                self.subscribers.add(subscriber_id)
+                if isinstance(subscriber_id, SPSCFramePacketQueue):
+                    self._queues = self._queues + (subscriber_id,)
+                self._subs_cv.notify_all()
+
+        if already_subscribed:
             logger.warning(
                 f"Attempted to subscribe to live stream at port {self.port} twice"
             )
+        else:
+            logger.info(f"Added subscriber to stream {self.port}")
+            logger.info(f"...now {len(self.subscribers)} subscriber(s) at {self.port}, fps_target: {self.fps_target}")
 
     def unsubscribe(self, subscriber_id):
         """
         Remove a subscriber by ID or reference
         """
-        try:
-            if subscriber_id in self.subscribers:
-                logger.info(f"Removing subscriber from stream at port {self.port}")
-                self.subscribers.remove(subscriber_id)
-                logger.info(
-                    f"{len(self.subscribers)} subscriber(s) remain at port {self.port}"
-                )
-            else:
-                logger.warning(
-                    f"Attempted to unsubscribe to live stream that was not subscribed to at port {self.port}"
-                )
-        except:
-            logger.warning("Attempted to remove subscriber that may have been removed twice at once")
+        # membership test and removal share the lock, so simultaneous unsubscribes cannot collide
+        with self._subs_cv:
+            was_subscribed = subscriber_id in self.subscribers
+            self.subscribers.discard(subscriber_id)
+            self._queues = tuple(q for q in self._queues if q is not subscriber_id)
+            self._subs_cv.notify_all()
+        # wake readers blocked in wait_for_frame so they can notice that they have been let go
+        with self._frame_cv:
+            self._frame_cv.notify_all()
+
+        if was_subscribed:
+            logger.info(f"Removed subscriber from stream at port {self.port}")
+            logger.info(
+                f"{len(self.subscribers)} subscriber(s) remain at port {self.port}"
+            )
+        else:
+            logger.warning(
+                f"Attempted to unsubscribe to live stream that was not subscribed to at port {self.port}"
+            )
 
-    def get_latest_frame(self):
+    @property
+    def latest_frame_packet(self):
+        return self._frames[self._current]
+
+    def get_latest_frame(self, draw_fps=False):
         """
         Return the latest frame packet
+
+        draw_fps: return a copy of the packet with the current FPS drawn onto a copy of its frame.
+        The overlay is drawn here on request rather than on every frame in the capture thread.
         """
-        return self.latest_frame_packet
+        frame_packet = self._frames[self._current]
+        if draw_fps and frame_packet is not None:
+            frame = frame_packet.frame.copy()
+            self._add_fps(frame)
+            frame_packet = replace(frame_packet, frame=frame)
+        return frame_packet
+
+    def wait_for_frame(self, last_seq: int = 0, timeout: float | None = None):
+        """
+        Block until a frame newer than last_seq is available and return (frame_seq, frame_packet).
+        A frame_seq of 0 means no frame has been read yet. If the timeout expires or the stream
+        is stopped first, the returned frame_seq will equal last_seq.
+        """
+        with self._frame_cv:
+            self._frame_cv.wait_for(lambda: self._frame_seq != last_seq or self.stop_event.is_set(), timeout)
+            return self._frame_seq, self._frames[self._current]
 
     def set_fps_target(self, fps_target):
         """
-        This is done through a method as it will also do a one-time determination of the times as which
-        frames should be read (the milestones)
+        This is done through a method as it will also do a one-time determination of the
+        period between the times at which frames should be read (the milestones)
         """
+        if fps_target <= 0:
+            raise ValueError(f"fps_target must be positive, got {fps_target}")
 
         self.fps_target = fps_target
-        milestones = []
-        for i in range(0, fps_target):
-            milestones.append(i / fps_target)
+        self._period = 1.0 / fps_target
+        self._next_deadline = perf_counter() + self.wait_to_next_frame()
         logger.info(f"Setting fps to {self.fps_target} at port {self.port}")
-        self.milestones = np.array(milestones)
+
+    def set_decode_fps(self, decode_fps: float | None):
+        """
+        Frames are still grabbed at fps_target to keep the capture current, but only decoded
+        (and published) at decode_fps, which is all a preview needs. Queue subscribers such as a
+        recording override this so that they get every frame. None decodes every frame.
+        """
+        self._decode_period = None if decode_fps is None else 1.0 / decode_fps
+        logger.info(f"Setting decode fps to {decode_fps} at port {self.port}")
+
+    def _should_decode(self, now: float) -> bool:
+        if self._decode_period is None or self._queues:
+            return True
+        # half a read period of tolerance so that jitter does not slip a decode back by a whole frame
+        if now - self._last_decode >= self._decode_period - self._period / 2:
+            self._last_decode = now
+            return True
+        return False
 
     def wait_to_next_frame(self):
         """
         based on the next milestone time, return the time needed to sleep so that
         a frame read immediately after would occur when needed
-        """
-
-        time = perf_counter()
-        fractional_time = time % 1
-        all_wait_times = self.milestones - fractional_time
-        future_wait_times = all_wait_times[all_wait_times > 0]
 
-        if len(future_wait_times) == 0:
-            return 1 - fractional_time
-        else:
-            return future_wait_times[0]
+        milestones fall on whole multiples of the period, so this is just the time remaining
+        in the current period
+        """
+        return self._period - perf_counter() % self._period
 
-    def get_FPS_actual(self):
+    def get_FPS_actual(self, now=None):
         """
         set the actual frame rate; called within roll_camera()
         needs to be called from within roll_camera to actually work
         Note that this is a smoothed running average
+
+        now: time of the current frame; the worker passes the frame_time it has already taken
         """
-        self.delta_time = perf_counter() - self.start_time
-        self.start_time = perf_counter()
+        if now is None:
+            now = perf_counter()
+        self.delta_time = now - self.start_time
+        self.start_time = now
         if not self.avg_delta_time:
             self.avg_delta_time = self.delta_time
 
@@ -139,123 +297,161 @@ class LiveStream():
         frame
         """
 
+        prioritize_capture_thread(self.port)
+
         self.frame_index = 0
         self.start_time = perf_counter()  # used to get initial delta_t for FPS
+        self._next_deadline = self.start_time + self.wait_to_next_frame()
         first_time = True
+        # only re-queried after a failed read, as the capture is otherwise only closed by change_resolution
+        capture_opened = self.camera.capture.isOpened()
         while not self.stop_event.is_set():
-            loop_start_time = perf_counter()
-            
+            # timing diagnostics are only gathered when they will actually be logged
+            debug = logger.isEnabledFor(logging.DEBUG)
+            published = False
+            if debug:
+                loop_start_time = perf_counter()
+
             if first_time:
                 logger.info(f"Camera now rolling at port {self.port}")
                 first_time = False
 
-            if self.camera.capture.isOpened():
-                spinlock_start_time = perf_counter()
-                # slow wait if not pushing frames
-                # this is a sub-optimal busy wait spin lock, but it works and I'm tired.
+            if capture_opened:
+                if debug:
+                    spinlock_start_time = perf_counter()
+                # block without polling while nothing is subscribed; woken by subscribe() or stop()
                 # stop_event condition added to allow loop to wrap up
                 # if attempting to change resolution
-                spinlock_looped = False
-                while len(self.subscribers) == 0 and not self.stop_event.is_set():
-                    if not spinlock_looped:
-                        logger.info(f"Spinlock initiated at port {self.port}")
-                        spinlock_looped = True
-                    sleep(0.5)
-                if spinlock_looped == True:
-                    logger.info(f"Spinlock released at port {self.port}")
-                spinlock_end_time = perf_counter()
-                spinlock_duration = spinlock_end_time - spinlock_start_time
+                with self._subs_cv:
+                    spinlock_looped = len(self.subscribers) == 0 and not self.stop_event.is_set()
+                    if spinlock_looped:
+                        logger.info("Spinlock initiated at port %s", self.port)
+                        self._subs_cv.wait_for(lambda: len(self.subscribers) > 0 or self.stop_event.is_set())
+                    has_subscribers = len(self.subscribers) > 0
+                if spinlock_looped:
+                    logger.info("Spinlock released at port %s", self.port)
+                if debug:
+                    spinlock_duration = perf_counter() - spinlock_start_time
 
                 # Wait an appropriate amount of time to hit the frame rate target
-                sleep(self.wait_to_next_frame())
+                # deadlines advance by whole periods from a milestone, so oversleeping one
+                # frame does not push back the next and the read times do not drift
+                now = perf_counter()
+                if self._next_deadline < now - self._period:
+                    # fell more than a frame behind (e.g. idle without subscribers); realign to the next milestone
+                    self._next_deadline = now + self.wait_to_next_frame()
+                slack = self._next_deadline - now
+                if slack > 0:
+                    sleep(slack)
+                self._next_deadline += self._period
 
                 read_start = perf_counter()
-                self.success, self.frame = self.camera.capture.read()
+                decode = self._should_decode(read_start)
+                if decode:
+                    # every read gets a fresh array: published frames are handed out without a copy and
+                    # may be held by readers for any length of time, so their memory is never reused
+                    success, frame = self.camera.capture.read()
+                else:
+                    # advance the capture without paying for the decode
+                    success, frame = self.camera.capture.grab(), None
                 read_stop = perf_counter()
-                read_duration = read_stop - read_start
-                self.frame_time = (read_start + read_stop) / 2
-
-                if self.success and len(self.subscribers) > 0:
-                    process_start_time = perf_counter()
-                    
-                    if self._show_fps:
-                        fps_start_time = perf_counter()
-                        self._add_fps()
-                        fps_end_time = perf_counter()
-                        fps_duration = fps_end_time - fps_start_time
-                    else:
-                        fps_duration = 0
-
-                    # Rate of calling recalc must be frequency of this loop
-                    fps_calc_start_time = perf_counter()
-                    self.FPS_actual = self.get_FPS_actual()
-                    fps_calc_end_time = perf_counter()
-                    fps_calc_duration = fps_calc_end_time - fps_calc_start_time
-                    
-                    
-                    packet_start_time = perf_counter()
-                    frame_packet = FramePacket(
-                        port=self.port,
-                        frame_time=self.frame_time,
-                        frame_index=self.frame_index,
-                        frame=self.frame,
-                        fps=self.FPS_actual
-                    )
-                    packet_end_time = perf_counter()
-                    packet_duration = packet_end_time - packet_start_time
-
-                    # Instead of putting into queues, update the latest frame packet
-                    update_start_time = perf_counter()
-                    self.latest_frame_packet = frame_packet
-                    self.frame_updated.set()  # Signal that a new frame is available
-                    self.frame_updated.clear()  # Reset for next frame
-                    update_end_time = perf_counter()
-                    update_duration = update_end_time - update_start_time
-                    
-                    process_end_time = perf_counter()
-                    process_duration = process_end_time - process_start_time
-
-                self.frame_index += 1
+
+                if not success:
+                    # distinguish a dropped frame from a capture that has closed
+                    capture_opened = self.camera.capture.isOpened()
+
+                if has_subscribers and decode:
+                    published = self._publish_frame(success, frame, (read_start + read_stop) / 2)
+                else:
+                    self.frame_index += 1
+
+                if debug:
+                    publish_duration = perf_counter() - read_stop
             else:
-                logger.warning(f"Camera not opened at port {self.port}")
+                logger.warning("Camera not opened at port %s", self.port)
                 sleep(0.5)
-                
-            loop_end_time = perf_counter()
-            loop_duration = loop_end_time - loop_start_time
-            
+                capture_opened = self.camera.capture.isOpened()
+
             # Print timing information
-            if self.success and len(self.subscribers) > 0:
-                logger.debug(f"Port {self.port} Timing - Loop: {loop_duration:.6f}s, Read: {read_duration:.6f}s, "
-                           f"Process: {process_duration:.6f}s (FPS Calc: {fps_calc_duration:.6f}s, "
-                           f"Packet: {packet_duration:.6f}s, Update: {update_duration:.6f}s)")
-            else:
-                if 'spinlock_duration' in locals():
-                    logger.debug(f"Port {self.port} Timing - Loop: {loop_duration:.6f}s, Spinlock: {spinlock_duration:.6f}s")
+            if debug:
+                loop_duration = perf_counter() - loop_start_time
+                if published:
+                    logger.debug(
+                        "Port %s Timing - Loop: %.6fs, Read: %.6fs, Publish: %.6fs",
+                        self.port,
+                        loop_duration,
+                        read_stop - read_start,
+                        publish_duration,
+                    )
+                elif 'spinlock_duration' in locals():
+                    logger.debug(
+                        "Port %s Timing - Loop: %.6fs, Spinlock: %.6fs", self.port, loop_duration, spinlock_duration
+                    )
                 else:
-                    logger.debug(f"Port {self.port} Timing - Loop: {loop_duration:.6f}s")
+                    logger.debug("Port %s Timing - Loop: %.6fs", self.port, loop_duration)
 
         logger.info(f"Stream stopped at port {self.port}")
         self.stop_event.clear()
-        self.stop_confirm.put("Successful Stop")
+
+    def _publish_frame(self, success, frame, frame_time):
+        """
+        Make a newly read frame available to subscribers. Returns True if a frame packet was published.
+        """
+        self.success = success
+        self.frame = frame
+        self.frame_time = frame_time
+        published = False
+
+        if success:
+            # Rate of calling recalc must be frequency of this loop
+            self.FPS_actual = self.get_FPS_actual(frame_time)
+
+            frame_packet = FramePacket(
+                port=self.port,
+                frame_time=frame_time,
+                frame_index=self.frame_index,
+                frame=frame,
+                fps=self.FPS_actual
+            )
+
+            # Instead of putting into queues, update the latest frame packet
+            next_slot = 1 - self._current
+            self._frames[next_slot] = frame_packet
+            with self._frame_cv:
+                self._current = next_slot  # single store publishes the packet to readers
+                self._frame_seq += 1
+                self._frame_cv.notify_all()  # Signal that a new frame is available
+            for queue in self._queues:
+                queue.enqueue(frame_packet)
+            published = True
+
+        self.frame_index += 1
+        return published
 
     def set_nearest_fps(self, actual_fps):
         """
         Set the camera to the nearest available (rounding down) FPS setting
+        returns None if actual_fps is below the lowest setting
         """
-        smallest_min = 1000
-        nearest_fps = None
-        fps_divisions = [5, 10, 15, 20, 30]
-        for devision in fps_divisions:
-            if devision < actual_fps and (actual_fps - devision < smallest_min):
-                    smallest_min = actual_fps - devision
-                    nearest_fps = devision
-
-        return nearest_fps
+        index = bisect_right(FPS_STEPS, actual_fps) - 1
+        return FPS_STEPS[index] if index >= 0 else None
     
+    def stop(self):
+        """
+        Signal the worker thread to wrap up, waking it if it is waiting on subscribers
+        """
+        with self._subs_cv:
+            self.stop_event.set()
+            self._subs_cv.notify_all()
+        # release anyone blocked in wait_for_frame
+        with self._frame_cv:
+            self._frame_cv.notify_all()
+
     def change_resolution(self, res):
         logger.info(f"About to stop camera at port {self.port}")
-        self.stop_event.set()
-        self.stop_confirm.get()
+        self.stop()
+        # make sure camera no longer reading before trying to change resolution
+        self.thread.join()
         logger.info(f"Roll camera stop confirmed at port {self.port}")
 
         self.FPS_actual = 0
@@ -275,11 +471,11 @@ class LiveStream():
         self.thread = Thread(target=self._play_worker, args=(), daemon=True)
         self.thread.start()
 
-    def _add_fps(self):
+    def _add_fps(self, frame):
         """NOTE: this is used in F5 test, not in external use"""
         self.fps_text = str(int(round(self.FPS_actual, 0)))
         cv2.putText(
-            self.frame,
+            frame,
             "FPS:" + self.fps_text,
             (10, 70),
             cv2.FONT_HERSHEY_PLAIN,
@@ -289,6 +485,28 @@ class LiveStream():
         )
 
 
+def prioritize_capture_thread(port: int):
+    """
+    Best effort to keep the calling capture thread on time: pin it to one of the available
+    cores (chosen by port so streams spread out) so the decoder's cache stays warm, and raise
+    its priority. Both are Linux/POSIX only and raising priority usually needs privileges, so
+    anything unsupported or refused is skipped. This improves tail latency of read -> publish.
+    """
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+        core = cores[port % len(cores)]
+        os.sched_setaffinity(0, {core})  # pid 0 is the calling thread on Linux
+        logger.info(f"Capture thread for port {port} pinned to core {core}")
+    except (AttributeError, OSError):
+        pass
+
+    try:
+        os.nice(-5)
+        logger.info(f"Capture thread priority raised for port {port}")
+    except (AttributeError, OSError):
+        pass
+
+
 if __name__ == "__main__":
     ports = [0]
 
@@ -304,24 +522,21 @@ if __name__ == "__main__":
         print(f"Creating Video Stream for camera {cam.port}")
         stream = LiveStream(cam, fps_target=30)
         stream.subscribe(f"display_{cam.port}")  # Simple string ID for the subscriber
-        stream._show_fps = False
         streams.append(stream)
 
+    # wake only when a stream has a new frame rather than redisplaying the same one in a hot loop
+    frame_seqs = {stream.port: 0 for stream in streams}
     while True:
-        try:
-            for port in ports:
-                # Get the latest frame directly from each stream
-                frame_packet = streams[ports.index(port)].get_latest_frame()
-                if frame_packet is not None:
-                    cv2.imshow(
-                        (str(port) + ": 'q' to quit"),
-                        frame_packet.frame,
-                    )
-
-        # bad reads until connection to src established
-        except AttributeError:
-            pass
+        for stream in streams:
+            frame_seq, frame_packet = stream.wait_for_frame(frame_seqs[stream.port], timeout=1 / stream.fps_target)
+            if frame_seq != frame_seqs[stream.port]:
+                frame_seqs[stream.port] = frame_seq
+                cv2.imshow(
+                    (str(stream.port) + ": 'q' to quit"),
+                    frame_packet.frame,
+                )
 
+        # waitKey also services the HighGUI windows, so it must still run on every pass
         key = cv2.waitKey(1)
 
         if key == ord("q"):
@@ -217,8 +217,8 @@ class Configurator:
         return charuco
 
     def save_charuco(self, charuco: Charuco):
-        self.dict["charuco"] = charuco.__dict__
-        logger.info(f"Saving charuco with params {charuco.__dict__} to config")
+        self.dict["charuco"] = asdict(charuco)
+        logger.info(f"Saving charuco with params {self.dict['charuco']} to config")
         self.update_config_toml()
 
     def save_camera(self, camera: Camera | CameraData):
@@ -1,9 +1,10 @@
 import cv2
 import numpy as np
 from PySide6.QtCore import Qt, QTimer, Slot, Signal, QThread, QSize, QObject, QUrl 
-from PySide6.QtGui import QImage, QPixmap, QTransform
+from PySide6.QtGui import QImage, QPixmap
 from PySide6.QtMultimedia import QSoundEffect
 from PySide6.QtWidgets import (
+    QApplication,
     QWidget,
     QVBoxLayout,
     QHBoxLayout,
@@ -20,12 +21,13 @@ from datetime import datetime
 from enum import Enum
 from threading import Event
 
+import math
 import time
 
 from caliscope.session.session import LiveSession 
-from caliscope.cameras.live_stream import LiveStream
+from caliscope.cameras.live_stream import LiveStream, SPSCFramePacketQueue
 from caliscope.gui.frame_emitters.frame_emitter import FrameEmitter # Adjusted import path
-from caliscope.interface import FramePacket 
+from caliscope.recording.video_writers import check_frame_layout, create_video_writer
 import caliscope.logger 
 
 logger = caliscope.logger.get(__name__)
@@ -44,31 +46,53 @@ class RecordingThread(QThread):
     finished_saving = Signal()
     error_signal = Signal(str)
 
-    def __init__(self, stream : LiveStream, video_writer: cv2.VideoWriter, port: int, parent=None):
+    def __init__(
+        self,
+        stream: LiveStream,
+        frame_queue: SPSCFramePacketQueue,
+        video_writer: cv2.VideoWriter,
+        port: int,
+        parent=None,
+    ):
         super().__init__(parent)
         self.stream = stream
+        self.frame_queue = frame_queue
         self.video_writer = video_writer
         self.port = port
         self._is_running = True
+        self._batch_size = 8
+        self._frame_size = stream.size
 
     def run(self):
         logger.info(f"RecordingThread for port {self.port} started.")
         frames_written = 0
         try:
-            while self._is_running:
+            # keep draining after a stop so that frames already queued are still saved
+            while self._is_running or self.frame_queue.qsize() > 0:
                 try:
-                    self.stream.frame_updated.wait()
-                    frame_packet: FramePacket = self.stream.latest_frame_packet
-                    if frame_packet is None: 
-                        logger.info(f"RecordingThread for port {self.port} received sentinel. Stopping.")
-                        break
-                    self.video_writer.write(frame_packet.frame)
-                    frames_written += 1
+                    # time out periodically so that a stop is noticed even if frames are no longer arriving
+                    frame_packet = self.frame_queue.dequeue_blocking(timeout_ms=100)
+                    if frame_packet is None:
+                        continue
+                    if frames_written == 0:
+                        check_frame_layout(frame_packet.frame, self._frame_size)
+
+                    # when the writer has fallen behind, take whatever else is already queued
+                    # and write it in one pass rather than waking once per frame
+                    batch = [frame_packet]
+                    while len(batch) < self._batch_size and (frame_packet := self.frame_queue.dequeue()) is not None:
+                        batch.append(frame_packet)
+
+                    for frame_packet in batch:
+                        self.video_writer.write(frame_packet.frame)
+                    frames_written += len(batch)
                 except Exception as e:
                     logger.error(f"Error writing frame in RecordingThread for port {self.port}: {e}")
                     self.error_signal.emit(f"Error writing frame: {e}")
                     break
             logger.info(f"RecordingThread for port {self.port}: Main loop exited. Frames written: {frames_written}")
+            if self.frame_queue.dropped:
+                logger.warning(f"RecordingThread for port {self.port}: {self.frame_queue.dropped} frames dropped")
         finally:
             if self.video_writer.isOpened():
                 self.video_writer.release()
@@ -78,9 +102,59 @@ class RecordingThread(QThread):
     def stop(self):
         logger.info(f"RecordingThread for port {self.port}: Stop called.")
         self._is_running = False
+        self.frame_queue.wake()
 
 
 
+_PRELOADED_SOUNDS = {}
+
+
+def preloaded_sound(path: str) -> QSoundEffect:
+    """
+    One QSoundEffect per file for the life of the application. Each is owned by the
+    QApplication rather than a widget, so its decoded buffer survives the widget being
+    rebuilt and the same file is never loaded twice.
+    """
+    if path not in _PRELOADED_SOUNDS:
+        effect = QSoundEffect(QApplication.instance())
+        effect.loadedChanged.connect(lambda: effect.isLoaded() and _prewarm_sound(effect))
+        effect.setSource(QUrl.fromLocalFile(path))
+        effect.setVolume(1.0)
+        _PRELOADED_SOUNDS[path] = effect
+    return _PRELOADED_SOUNDS[path]
+
+
+def _prewarm_sound(effect: QSoundEffect):
+    """
+    Some backends only set up the audio output on the first play(), which delays that beep.
+    A muted play as soon as the file has loaded takes that hit before it matters.
+    """
+    effect.setMuted(True)
+    effect.play()
+
+    def finish():
+        effect.stop()
+        effect.setMuted(False)
+
+    QTimer.singleShot(5, finish)
+
+
+class ResolutionProbeThread(QThread):
+    resolutions_found = Signal(int, object)  # port, list of (width, height) or None on failure
+
+    def __init__(self, camera, parent=None):
+        super().__init__(parent)
+        self.camera = camera
+
+    def run(self):
+        try:
+            available_resolutions = self.camera.get_all_available_resolutions()
+        except Exception as e:
+            logger.error(f"Error probing resolutions of camera {self.camera.port}: {e}")
+            available_resolutions = None
+        self.resolutions_found.emit(self.camera.port, available_resolutions)
+
+
 class RecordSingleCameraWidget(QWidget):
     def __init__(self, live_session: LiveSession, parent=None):
         super().__init__(parent)
@@ -90,19 +164,17 @@ class RecordSingleCameraWidget(QWidget):
         self.frame_emitter = None 
         self.video_writer = None
         self.recording_thread = None
-        self.recording_subscriber_id = "RecordingThread"
+        self.recording_queue = None
+        # ports with a ResolutionProbeThread running; their streams are left idle until it finishes
+        self._probing_ports = set()
 
         self.current_action = NextRecordingActions.SELECT_CAMERA
 
         # Sound Effects - User needs to provide these sound files
-        self.countdown_beep_effect = QSoundEffect(self)
-        self.countdown_beep_effect.setSource(QUrl.fromLocalFile("sounds/countdown_beep.wav"))
-        
-        self.final_beep_effect = QSoundEffect(self)
-        self.final_beep_effect.setSource(QUrl.fromLocalFile("sounds/final_beep.wav"))
-
-        self.stop_beep_effect = QSoundEffect(self)
-        self.stop_beep_effect.setSource(QUrl.fromLocalFile("sounds/final_beep.wav"))
+        self.countdown_beep_effect = preloaded_sound("sounds/countdown_beep.wav")
+        self.final_beep_effect = preloaded_sound("sounds/final_beep.wav")
+        # same file as the final beep, so share its already loaded effect
+        self.stop_beep_effect = preloaded_sound("sounds/final_beep.wav")
 
         
         self._init_ui()
@@ -192,13 +264,22 @@ class RecordSingleCameraWidget(QWidget):
         right_panel.addWidget(recording_group)
         main_layout.addLayout(right_panel, 1) 
 
+        # the repeating timers only refresh the display; elapsed time is read from the clock
+        # and the countdown end and recording length are each a single shot, so neither drifts
+        # with the ticks
         self.countdown_timer = QTimer(self)
         self.countdown_timer.setSingleShot(False) 
+        self.countdown_end_timer = QTimer(self)
+        self.countdown_end_timer.setSingleShot(True)
         self.current_countdown_value = 0
+        self._countdown_end = 0.0
 
         self.recording_duration_timer = QTimer(self)
+        self.record_length_timer = QTimer(self)
+        self.record_length_timer.setSingleShot(True)
         self.current_record_duration_s = 0
         self.target_record_length_s = 0
+        self._record_start = 0.0
 
     def _connect_widgets(self):
         self.port_selector_combo.currentIndexChanged.connect(self.on_port_selected)
@@ -207,7 +288,9 @@ class RecordSingleCameraWidget(QWidget):
         self.render_fps_spin.valueChanged.connect(self.on_render_fps_changed)
         self.start_stop_button.clicked.connect(self.toggle_start_stop)
         self.countdown_timer.timeout.connect(self.update_countdown_display)
+        self.countdown_end_timer.timeout.connect(self.on_countdown_finished)
         self.recording_duration_timer.timeout.connect(self.update_recording_duration)
+        self.record_length_timer.timeout.connect(self.on_record_length_reached)
 
     def populate_camera_ports(self):
         self.port_selector_combo.blockSignals(True) 
@@ -249,6 +332,10 @@ class RecordSingleCameraWidget(QWidget):
 
     @Slot(int)
     def on_port_selected(self, index):
+        if self.active_stream:
+            # hand the previous camera back with every frame decoded
+            self.active_stream.set_decode_fps(None)
+
         if self.frame_emitter: 
             self.frame_emitter.keep_collecting.clear()
             self.frame_emitter.unsubscribe()
@@ -294,17 +381,34 @@ class RecordSingleCameraWidget(QWidget):
             # Get current resolution
             width, height = cam_obj.size
             self.resolution_label.setText(f"Current Resolution: {width}x{height}")
-            
-            # Populate available resolutions
+
+            if not cam_obj.available_resolutions_known:
+                # probing reconnects the camera over and over, so nothing may read from it until
+                # the probe is done; the live view is started from on_resolutions_found
+                self.live_view_label.setText("Probing camera resolutions...")
+                self.current_action = NextRecordingActions.SELECT_CAMERA
+                self._set_inputs_enabled(False)
+                self.update_button_state()
+                self.populate_available_resolutions(cam_obj)
+                return
+
             self.populate_available_resolutions(cam_obj)
         else:
             self.resolution_label.setText("Current Resolution: Unknown")
 
+        self._start_live_view()
+
+    def _start_live_view(self):
         try:
             # The FrameEmitter constructor doesn't directly take an FPS value,
             # but accepts a pixmap_edge_length. We'll subscribe to the stream in its constructor.
-            self.frame_emitter = FrameEmitter(self.active_stream, _RENDER_FPS, self.live_view_label.width()) # Defualt to 6 FPS for rendering
+            self.frame_emitter = FrameEmitter(
+                self.active_stream, self.render_fps_spin.value(), self.live_view_label.width(), mirror=False
+            )
             self.frame_emitter.subscribe()
+            self.frame_emitter.set_paused(not self.isVisible())
+            # the preview only needs frames decoded at the render rate; a recording still gets all of them
+            self.active_stream.set_decode_fps(self.render_fps_spin.value())
             self.frame_emitter.ImageBroadcast.connect(self.update_live_view)
             # The frame_emitter already calls start() in its constructor
             logger.info(f"FrameEmitter started for port {self.selected_port} at {self.render_fps_spin.value()} FPS for rendering.")
@@ -323,14 +427,50 @@ class RecordSingleCameraWidget(QWidget):
         self.update_button_state()
         
     def populate_available_resolutions(self, camera):
-        """Populate the resolution selector dropdown with available camera resolutions"""
+        """
+        Populate the resolution selector dropdown with available camera resolutions.
+        The first probe of a camera takes seconds, so it runs on a ResolutionProbeThread;
+        after that the camera returns its cached result. The probe reconnects the camera, so
+        its stream is kept idle (no live view, no recording) until on_resolutions_found.
+        """
+        if camera.available_resolutions_known:
+            self._fill_resolution_combo(camera, camera.get_all_available_resolutions())
+            return
+
+        self.resolution_selector_combo.blockSignals(True)
+        self.resolution_selector_combo.clear()
+        self.resolution_selector_combo.setPlaceholderText("Probing resolutions...")
+        self.resolution_selector_combo.setEnabled(False)
+        self.resolution_selector_combo.blockSignals(False)
+
+        if camera.port in self._probing_ports:
+            # already being probed (the user came back to it); its result starts the live view
+            return
+        self._probing_ports.add(camera.port)
+
+        probe = ResolutionProbeThread(camera, self)
+        probe.resolutions_found.connect(self.on_resolutions_found)
+        probe.finished.connect(probe.deleteLater)
+        probe.start()
+
+    @Slot(int, object)
+    def on_resolutions_found(self, port, available_resolutions):
+        self._probing_ports.discard(port)
+        if port != self.selected_port:
+            # the user has moved on to another camera; its result is cached for when they return
+            return
+        self._fill_resolution_combo(self.live_session.cameras.get(port), available_resolutions)
+        # the probe has let go of the camera, so the stream can start reading from it
+        self._start_live_view()
+
+    def _fill_resolution_combo(self, camera, available_resolutions):
         self.resolution_selector_combo.blockSignals(True)
         self.resolution_selector_combo.clear()
         
         try:
-            # Use the new method to get all available resolutions
-            available_resolutions = camera.get_all_available_resolutions()
-            
+            if available_resolutions is None:
+                raise RuntimeError("resolution probe failed")
+
             if not available_resolutions:
                 logger.warning(f"No available resolutions found for camera {camera.port}")
                 self.resolution_selector_combo.setPlaceholderText("No resolutions found")
@@ -424,8 +564,11 @@ class RecordSingleCameraWidget(QWidget):
                 
                 # Restart frame emitter
                 try:
-                    self.frame_emitter = FrameEmitter(self.active_stream, _RENDER_FPS, self.live_view_label.width())
+                    self.frame_emitter = FrameEmitter(
+                        self.active_stream, self.render_fps_spin.value(), self.live_view_label.width(), mirror=False
+                    )
                     self.frame_emitter.subscribe()
+                    self.frame_emitter.set_paused(not self.isVisible())
                     self.frame_emitter.ImageBroadcast.connect(self.update_live_view)
                     logger.info(f"FrameEmitter restarted after resolution change at {self.render_fps_spin.value()} FPS.")
                 except Exception as e:
@@ -444,23 +587,9 @@ class RecordSingleCameraWidget(QWidget):
         if not self.live_session or not self.active_stream or not self.isVisible():
             return 
         
-        # Create a transformation to flip the image
-        transform = QTransform()
-        
-        # For horizontal flip (mirroring left to right)
-        transform.scale(-1, 1)
-        
-        # For vertical flip (mirroring top to bottom)
-        # transform.scale(1, -1)
-        
-        # For both horizontal and vertical flip
-        # transform.scale(-1, -1)
-        
-        # Apply the transformation
-        flipped_pixmap = pixmap.transformed(transform)
-        
-        # Set the flipped pixmap to the label
-        self.live_view_label.setPixmap(flipped_pixmap)
+        # the emitter is created with mirror=False, so the frame arrives the right way round
+        # and needs no per-frame pixmap transform here
+        self.live_view_label.setPixmap(pixmap)
 
     @Slot(int)
     def on_record_fps_changed(self, value):
@@ -471,39 +600,28 @@ class RecordSingleCameraWidget(QWidget):
     @Slot(int)
     def on_render_fps_changed(self, value):
         if self.frame_emitter:
-            # Note: This functionality isn't directly supported by FrameEmitter
-            # You may want to modify the FrameEmitter class to support this
+            self.frame_emitter.set_render_fps(value)
+            self.active_stream.set_decode_fps(value)
             logger.info(f"Render FPS for port {self.selected_port} view set to {value}.")
 
-            try:
-                old_emitter = self.frame_emitter
-                self.frame_emitter = FrameEmitter(self.active_stream, value, self.live_view_label.width())
-                self.frame_emitter.ImageBroadcast.connect(self.update_live_view)
-                self.frame_emitter.subscribe()
-                
-                # Clean up the old emitter
-                old_emitter.keep_collecting.clear()
-                old_emitter.ImageBroadcast.disconnect(self.update_live_view)
-                old_emitter.unsubscribe()
-                old_emitter.stop()
-            except Exception as e:
-                logger.error(f"Error updating render FPS: {e}")
-
     def toggle_start_stop(self):
         logger.info(f"toggle_start_stop called. Current action: {self.current_action}")
         if self.current_action == NextRecordingActions.START_RECORDING:
             countdown_s = self.countdown_duration_spin.value()
             if countdown_s > 0:
                 self.current_countdown_value = countdown_s
+                self._countdown_end = time.monotonic() + countdown_s
                 self.current_action = NextRecordingActions.COUNTDOWN
                 self.update_button_state() 
                 self.start_stop_button.setText(f"{NextRecordingActions.COUNTDOWN.value} ({self.current_countdown_value}s)")
                 self.countdown_timer.start(1000) 
+                self.countdown_end_timer.start(countdown_s * 1000)
             else:
                 self._start_actual_recording()
         
         elif self.current_action == NextRecordingActions.COUNTDOWN:
             self.countdown_timer.stop()
+            self.countdown_end_timer.stop()
             self.current_action = NextRecordingActions.START_RECORDING
             self.update_button_state()
 
@@ -517,15 +635,20 @@ class RecordSingleCameraWidget(QWidget):
             logger.warning("No camera selected. Cannot start recording.")
 
     def update_countdown_display(self):
-        self.current_countdown_value -= 1
-        if self.current_countdown_value > 0:
-            self.start_stop_button.setText(f"{NextRecordingActions.COUNTDOWN.value} ({self.current_countdown_value}s)")
-            # Play countdown beep for the last 3 seconds
-            if self.current_countdown_value <= 3:
-                self.countdown_beep_effect.play()
-        else:
-            self.countdown_timer.stop()
-            self._start_actual_recording()
+        remaining_s = math.ceil(self._countdown_end - time.monotonic())
+        # a tick that lands just before the end can round to the second already shown; skip it
+        # so that it isn't beeped twice. The end itself is handled by countdown_end_timer
+        if remaining_s <= 0 or remaining_s == self.current_countdown_value:
+            return
+        self.current_countdown_value = remaining_s
+        self.start_stop_button.setText(f"{NextRecordingActions.COUNTDOWN.value} ({self.current_countdown_value}s)")
+        # Play countdown beep for the last 3 seconds
+        if self.current_countdown_value <= 3:
+            self.countdown_beep_effect.play()
+
+    def on_countdown_finished(self):
+        self.countdown_timer.stop()
+        self._start_actual_recording()
 
     def _start_actual_recording(self):
         if not self.active_stream or self.selected_port is None:
@@ -571,7 +694,7 @@ class RecordSingleCameraWidget(QWidget):
         logger.info(f"Ensured active stream ({self.selected_port}) FPS target is {record_fps} for recording.")
 
         try:
-            self.video_writer = cv2.VideoWriter(str(filepath), cv2.VideoWriter_fourcc(*'mp4v'), record_fps, resolution)
+            self.video_writer = create_video_writer(filepath, record_fps, resolution)
             if not self.video_writer.isOpened():
                 logger.error(f"Failed to open VideoWriter for {filepath}")
                 self.on_recording_error("Failed to open VideoWriter.")
@@ -581,9 +704,12 @@ class RecordSingleCameraWidget(QWidget):
             self.on_recording_error(f"VideoWriter creation error: {e}")
             return
         
-        self.active_stream.subscribe(self.recording_subscriber_id)
+        self.recording_queue = SPSCFramePacketQueue()
+        self.active_stream.subscribe(self.recording_queue)
         
-        self.recording_thread = RecordingThread(self.active_stream, self.video_writer, self.selected_port, self)
+        self.recording_thread = RecordingThread(
+            self.active_stream, self.recording_queue, self.video_writer, self.selected_port, self
+        )
         self.recording_thread.finished_saving.connect(self.on_recording_thread_finished)
         self.recording_thread.error_signal.connect(self.on_recording_error)
         self.recording_thread.start()
@@ -591,7 +717,10 @@ class RecordSingleCameraWidget(QWidget):
         logger.info(f"Recording started. Saving to {filepath} at {record_fps} FPS, resolution {resolution}.")
 
         self.current_record_duration_s = 0
+        self._record_start = time.monotonic()
         self.target_record_length_s = self.record_length_spin.value()
+        if self.target_record_length_s > 0:
+            self.record_length_timer.start(self.target_record_length_s * 1000)
         self.record_duration_label.setText("Duration: 0s")
         self.record_duration_remaining_label.setVisible(True)
         if self.target_record_length_s > 0:
@@ -601,26 +730,40 @@ class RecordSingleCameraWidget(QWidget):
         self.recording_duration_timer.start(1000)
 
     def update_recording_duration(self):
-        self.current_record_duration_s += 1
+        duration_s = int(time.monotonic() - self._record_start)
+        if duration_s == self.current_record_duration_s:
+            # an early tick; the labels already show this second
+            return
+        self.current_record_duration_s = duration_s
         self.record_duration_label.setText(f"Duration: {self.current_record_duration_s}s")
 
+        # an indefinite recording's "Remaining" text is set once in _start_actual_recording
         if self.target_record_length_s > 0:
-            remaining_s = self.target_record_length_s - self.current_record_duration_s
+            remaining_s = max(0, self.target_record_length_s - self.current_record_duration_s)
             self.record_duration_remaining_label.setText(f"Remaining: {remaining_s}s")
-            if remaining_s <= 0:
-                self.toggle_start_stop() 
-        else:
-            self.record_duration_remaining_label.setText("Remaining: Indefinite")
+
+    def on_record_length_reached(self):
+        if self.current_action == NextRecordingActions.STOP_RECORDING:
+            self.toggle_start_stop()
 
     def _stop_actual_recording(self):
         logger.info("Stopping actual recording...")
         self.recording_duration_timer.stop()
+        self.record_length_timer.stop()
         self.current_action = NextRecordingActions.SAVING
         self.update_button_state() 
 
         # Play sound effect when recording stops
         self.stop_beep_effect.play()
 
+        # unsubscribe first so that nothing more is queued while the recording thread drains
+        if self.active_stream and self.recording_queue:
+            try: 
+                self.active_stream.unsubscribe(self.recording_queue)
+                logger.info(f"Unsubscribed recording from stream {self.selected_port}.")
+            except Exception as e: 
+                logger.warning(f"Could not unsubscribe recording from stream {self.selected_port} during stop: {e}")
+
         if self.recording_thread and self.recording_thread.isRunning():
             self.recording_thread.stop() 
         else: 
@@ -628,13 +771,6 @@ class RecordSingleCameraWidget(QWidget):
                 self.video_writer.release()
             self.on_recording_complete() 
 
-        if self.active_stream and self.recording_subscriber_id:
-            try: 
-                self.active_stream.unsubscribe(self.recording_subscriber_id)
-                logger.info(f"Unsubscribed recording from stream {self.selected_port}.")
-            except Exception as e: 
-                logger.warning(f"Could not unsubscribe recording from stream {self.selected_port} during stop: {e}")
-
     @Slot()
     def on_recording_thread_finished(self):
         logger.info("Recording thread finished saving.")
@@ -645,7 +781,9 @@ class RecordSingleCameraWidget(QWidget):
     def on_recording_error(self, error_message):
         logger.error(f"Recording error: {error_message}")
         self.recording_duration_timer.stop()
+        self.record_length_timer.stop()
         self.countdown_timer.stop()
+        self.countdown_end_timer.stop()
 
         if self.recording_thread and self.recording_thread.isRunning():
             self.recording_thread.stop() 
@@ -656,7 +794,7 @@ class RecordSingleCameraWidget(QWidget):
         self.video_writer = None
         if self.active_stream:
             try:
-                self.active_stream.unsubscribe(self.recording_subscriber_id)
+                self.active_stream.unsubscribe(self.recording_queue)
             except Exception: pass
 
         self.current_action = NextRecordingActions.START_RECORDING 
@@ -703,6 +841,18 @@ class RecordSingleCameraWidget(QWidget):
                 self.current_action = NextRecordingActions.START_RECORDING 
              self.update_button_state() 
 
+    # the live view is only worth rendering while it can be seen; the recording has its
+    # own subscription to the stream and is unaffected
+    def showEvent(self, event):
+        if self.frame_emitter:
+            self.frame_emitter.set_paused(False)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        if self.frame_emitter:
+            self.frame_emitter.set_paused(True)
+        super().hideEvent(event)
+
     def closeEvent(self, event):
         logger.info("RecordSingleCameraWidget close event triggered.")
         if self.frame_emitter:
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import cv2
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QPixmap
 from PySide6.QtWidgets import (
     QApplication,
@@ -27,6 +27,8 @@ from caliscope.gui.utils.spinbox_utils import setup_spinbox_sizing
 
 logger = caliscope.logger.get(__name__)
 
+REBUILD_DEBOUNCE_MS = 180
+
 
 class CharucoWidget(QWidget):
     def __init__(self, controller: Controller):
@@ -38,10 +40,19 @@ class CharucoWidget(QWidget):
 
         # add group to do initial configuration of the charuco board
         self.charuco_config = CharucoConfigGroup(self.controller)
-        self.charuco_config.row_spin.valueChanged.connect(self.build_charuco)
-        self.charuco_config.column_spin.valueChanged.connect(self.build_charuco)
-        self.charuco_config.square_marker_size_mm.valueChanged.connect(self.build_charuco)
-        self.charuco_config.aruco_scale.valueChanged.connect(self.build_charuco)
+
+        # holding a spin box arrow fires many value changes; restart a short timer on each
+        # so the board is only rebuilt once the value settles
+        self._rebuild_timer = QTimer(self)
+        self._rebuild_timer.setSingleShot(True)
+        self._rebuild_timer.setInterval(REBUILD_DEBOUNCE_MS)
+        self._rebuild_timer.timeout.connect(self.build_charuco)
+
+        # lambda so that the new value is not taken as start()'s msec argument
+        self.charuco_config.row_spin.valueChanged.connect(lambda _: self._rebuild_timer.start())
+        self.charuco_config.column_spin.valueChanged.connect(lambda _: self._rebuild_timer.start())
+        self.charuco_config.square_marker_size_mm.valueChanged.connect(lambda _: self._rebuild_timer.start())
+        self.charuco_config.aruco_scale.valueChanged.connect(lambda _: self._rebuild_timer.start())
         self.charuco_config.invert_checkbox.stateChanged.connect(self.build_charuco)
 
         # Build primary actions
@@ -49,6 +60,7 @@ class CharucoWidget(QWidget):
 
         # Build display of board
         self.charuco_added = False  # track to handle redrawing of board
+        self._dirty = False  # the thumbnail was not drawn while hidden; see showEvent
         self.build_charuco()
         self.charuco_added = True
         # Create save button
@@ -65,19 +77,6 @@ class CharucoWidget(QWidget):
         self.layout().addWidget(self.charuco_display, 2)
         self.layout().addSpacing(10)
         self.layout().addWidget(self.save_button)  # Add the save button to the layout
-        
-        # self.layout().addLayout(self.save_png_hbox)
-
-        #################### ESTABLISH LARGELY VERTICAL LAYOUT ##############
-        self.setLayout(QVBoxLayout())
-        self.setWindowTitle("Charuco Board Builder")
-
-        self.layout().addWidget(self.charuco_config)
-        self.layout().setAlignment(self.charuco_config, Qt.AlignmentFlag.AlignHCenter)
-        self.layout().addWidget(QLabel("<i>Top left corner is point (0,0,0) when setting capture volume origin</i>"))
-        self.layout().addWidget(self.charuco_display, 2)
-        self.layout().addWidget(self.save_button)  # Add the save button to the layout
-        # self.layout().addSpacing(10)
         # self.layout().addLayout(self.save_png_hbox)
 
     def save_charuco_board(self):
@@ -96,17 +95,19 @@ class CharucoWidget(QWidget):
             # Generate the board image at a higher resolution
             board_img = self.charuco.board_img()
 
-            # Convert board image to RGB if it's grayscale
-            if len(board_img.shape) == 2:
-                board_img = cv2.cvtColor(board_img, cv2.COLOR_GRAY2BGR)
-        
-            # Save the image
+            # the board is single channel; imwrite stores it as a grayscale png as is
             cv2.imwrite(save_path, board_img)
             
             logger.info(f"Charuco board saved to {save_path}")
         except Exception as e:
             logger.error(f"Failed to save Charuco board: {str(e)}")
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._dirty:
+            self._dirty = False
+            self.draw_charuco_thumbnail()
+
     def build_charuco(self):
         columns = self.charuco_config.column_spin.value()
         rows = self.charuco_config.row_spin.value()
@@ -128,6 +129,23 @@ class CharucoWidget(QWidget):
             self.charuco_display = QLabel()
             self.charuco_display.setAlignment(Qt.AlignmentFlag.AlignHCenter)
 
+        if self.charuco_added and not self.isVisible():
+            # calibration must use the edited board right away, but nobody can see the
+            # thumbnail; it is drawn when the widget is next shown
+            self.controller.update_charuco(self.charuco)
+            self._dirty = True
+            return
+
+        if self.draw_charuco_thumbnail():
+            self.controller.update_charuco(self.charuco)
+
+    def draw_charuco_thumbnail(self) -> bool:
+        """
+        Display the current board, or an error message if it cannot be drawn. Returns whether it was drawn
+        """
+        columns = self.charuco.columns
+        rows = self.charuco.rows
+
         # interesting problem comes up when scaling this... I want to switch between scaling the width and height
         # based on how these two things relate....
 
@@ -138,7 +156,7 @@ class CharucoWidget(QWidget):
             # Clear any previous error message
             self.charuco_display.setStyleSheet("")
             self.charuco_display.setToolTip("")
-            self.controller.update_charuco(self.charuco)
+            return True
         except Exception as e:
             logger.error(f"Failed to create charuco board: {str(e)}")
             error_msg = """Unable to create board with current dimensions.\n
@@ -150,6 +168,7 @@ class CharucoWidget(QWidget):
             # Optional: Add some styling to make the error message stand out
             self.charuco_display.setStyleSheet("QLabel { color: red; }")
             self.charuco_display.setToolTip("Try adjusting the width and height to have a less extreme ratio")
+            return False
 
 
 
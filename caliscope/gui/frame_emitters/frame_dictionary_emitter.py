@@ -8,7 +8,7 @@ from PySide6.QtGui import QPixmap
 import caliscope.logger
 from caliscope.cameras.camera_array import CameraData
 from caliscope.cameras.synchronizer import Synchronizer
-from caliscope.gui.frame_emitters.tools import apply_rotation, cv2_to_qlabel, resize_to_square
+from caliscope.gui.frame_emitters.tools import apply_rotation, cv2_to_qlabel, downscale, resize_to_square
 
 logger = caliscope.logger.get(__name__)
 
@@ -59,12 +59,13 @@ class FrameDictionaryEmitter(QThread):
                     frame = frame_packet.frame_with_points
 
                 rotation_count = self.streams[port].rotation_count
-                frame = resize_to_square(frame)
+                frame = resize_to_square(downscale(frame, self.pixmap_edge_length))
                 frame = apply_rotation(frame, rotation_count)
                 image = cv2_to_qlabel(frame)
                 pixmap = QPixmap.fromImage(image)
 
-                if self.pixmap_edge_length:
+                # frames are shrunk with cv2 above; Qt only has to scale up ones smaller than the display
+                if self.pixmap_edge_length and pixmap.width() < int(self.pixmap_edge_length):
                     pixmap = pixmap.scaled(
                         int(self.pixmap_edge_length),
                         int(self.pixmap_edge_length),
@@ -3,13 +3,14 @@ import caliscope.logger
 
 from datetime import datetime
 from pathlib import Path
-from time import sleep
+from time import perf_counter, sleep
 from threading import Event
 
 import cv2
 from PySide6.QtCore import QSize, Qt, QThread, Signal
 from PySide6.QtGui import QFont, QIcon, QImage, QPixmap
 from caliscope.cameras.live_stream import LiveStream
+from caliscope.gui.frame_emitters.tools import downscale
 
 logger = caliscope.logger.get(__name__)
 
@@ -19,9 +20,11 @@ class FrameEmitter(QThread):
     ImageBroadcast = Signal(QPixmap)
     FPSBroadcast = Signal(float)
 
-    def __init__(self, stream:LiveStream, render_fps, pixmap_edge_length=None):
+    def __init__(self, stream:LiveStream, render_fps, pixmap_edge_length=None, mirror=True):
         # pixmap_edge length is from the display window. Keep the display area
         # square to keep life simple.
+        # mirror: flip frames left to right (as for a selfie view); done here so that
+        # displays don't need to transform the pixmap again on the GUI thread
         super(FrameEmitter, self).__init__()
         self.stream = stream
         self.subscriber_id = "frame_emitter+" + str(datetime.now())
@@ -30,8 +33,12 @@ class FrameEmitter(QThread):
         self.pixmap_edge_length = pixmap_edge_length
         self.rotation_count = stream.camera.rotation_count
         self.undistort = False
+        self.mirror = mirror
         self.render_fps = render_fps
         self.keep_collecting = Event()
+        # cleared while nothing is showing the frames; see set_paused
+        self._unpaused = Event()
+        self._unpaused.set()
         self.start()
 
     def subscribe(self):
@@ -40,27 +47,52 @@ class FrameEmitter(QThread):
     def unsubscribe(self):
         self.stream.unsubscribe(self.subscriber_id)
 
+    # both are read afresh on each pass of the loop, so a running emitter can be retuned in place
+    def set_render_fps(self, render_fps):
+        self.render_fps = render_fps
+
+    def set_pixmap_edge_length(self, pixmap_edge_length):
+        self.pixmap_edge_length = pixmap_edge_length
+
+    def set_paused(self, paused: bool):
+        """
+        While paused no frames are converted or emitted. The stream subscription is kept,
+        so resuming picks up with the next frame
+        """
+        if paused:
+            self._unpaused.clear()
+        else:
+            self._unpaused.set()
+
     def run(self):
         self.keep_collecting.set()
+        frame_seq = 0
 
+        last_frame = perf_counter()
         while self.keep_collecting.is_set():
-            sleep(1 / self.render_fps)
-            # Grab a frame from the queue and broadcast to displays
-            self.stream.frame_updated.wait()
-            self.frame_packet  = self.stream.latest_frame_packet
-
-            self.frame = resize_to_square(self.frame_packet.frame)
+            if not self._unpaused.wait(timeout=0.5):
+                # time out periodically so that a stop is noticed while paused
+                continue
+
+            # pace from the last frame's arrival rather than sleeping a whole period before waiting
+            # on the next one; otherwise a stream decoding at render_fps would be rendered well below it
+            sleep(max(0, 0.9 / self.render_fps - (perf_counter() - last_frame)))
+            # Grab a frame from the queue and broadcast to displays; the timeout means a stream
+            # that stops or goes quiet cannot leave this thread waiting past a stop()
+            new_seq, self.frame_packet = self.stream.wait_for_frame(frame_seq, timeout=0.5)
+            if new_seq == frame_seq or self.frame_packet is None:
+                continue
+            frame_seq = new_seq
+            last_frame = perf_counter()
+
+            # shrink to the display size first so that padding, rotation and conversion
+            # all work on the small frame and Qt has nothing left to scale
+            self.frame = resize_to_square(downscale(self.frame_packet.frame, self.pixmap_edge_length))
             self.apply_rotation()
 
             image = self.cv2_to_qlabel(self.frame)
-            pixmap = QPixmap.fromImage(image)
-
-            if self.pixmap_edge_length:
-                pixmap = pixmap.scaled(
-                    int(self.pixmap_edge_length),
-                    int(self.pixmap_edge_length),
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                )
+            # the image is already in a format Qt can upload as is; don't let it convert first
+            pixmap = QPixmap.fromImage(image, Qt.ImageConversionFlag.NoFormatConversion)
             self.ImageBroadcast.emit(pixmap)
             
             # moved to monocalibrator...delete if works well
@@ -69,18 +101,22 @@ class FrameEmitter(QThread):
         logger.info(f"Thread loop within frame emitter at port {self.stream.port} successfully ended")
 
     def stop(self):
-        self.keep_collecting = False
+        self.keep_collecting.clear()
         self.quit()
 
     def cv2_to_qlabel(self, frame):
-        Image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        FlippedImage = cv2.flip(Image, 1)
+        # Qt reads OpenCV's BGR order directly, so no channel swap is needed. The QImage
+        # only wraps the array (kept alive as self.frame) until QPixmap.fromImage copies it
+        if self.mirror:
+            frame = cv2.flip(frame, 1)
+        self.frame = frame
 
         qt_frame = QImage(
-            FlippedImage.data,
-            FlippedImage.shape[1],
-            FlippedImage.shape[0],
-            QImage.Format.Format_RGB888,
+            frame.data,
+            frame.shape[1],
+            frame.shape[0],
+            frame.strides[0],
+            QImage.Format.Format_BGR888,
         )
         return qt_frame
 
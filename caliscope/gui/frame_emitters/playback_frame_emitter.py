@@ -8,7 +8,7 @@ from PySide6.QtGui import QPixmap
 
 import caliscope.calibration.draw_charuco as draw_charuco
 import caliscope.logger
-from caliscope.gui.frame_emitters.tools import apply_rotation, cv2_to_qlabel, resize_to_square
+from caliscope.gui.frame_emitters.tools import apply_rotation, cv2_to_qlabel, downscale, resize_to_square
 from caliscope.recording.recorded_stream import RecordedStream
 
 logger = caliscope.logger.get(__name__)
@@ -81,12 +81,13 @@ class PlaybackFrameEmitter(QThread):
                 self._apply_undistortion()
 
                 logger.debug(f"Frame size is {self.frame.shape} following undistortion")
-                self.frame = resize_to_square(self.frame)
+                self.frame = resize_to_square(downscale(self.frame, self.pixmap_edge_length))
                 self.frame = apply_rotation(self.frame, self.stream.rotation_count)
                 image = cv2_to_qlabel(self.frame)
                 pixmap = QPixmap.fromImage(image)
 
-                if self.pixmap_edge_length:
+                # frames are shrunk with cv2 above; Qt only has to scale up ones smaller than the display
+                if self.pixmap_edge_length and pixmap.width() < int(self.pixmap_edge_length):
                     pixmap = pixmap.scaled(
                         int(self.pixmap_edge_length),
                         int(self.pixmap_edge_length),
@@ -6,6 +6,23 @@ import caliscope.logger
 logger = caliscope.logger.get(__name__)
 
 
+def downscale(frame, edge_length=None):
+    """
+    Shrink frame so that its longer side is edge_length, keeping the aspect ratio.
+    Frames that already fit are returned as they are.
+    """
+    if not edge_length:
+        return frame
+
+    height, width = frame.shape[:2]
+    scale = int(edge_length) / max(height, width)
+    if scale >= 1:
+        return frame
+
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
 def resize_to_square(frame):
     height = frame.shape[0]
     width = frame.shape[1]
@@ -44,13 +61,15 @@ def apply_rotation(frame, rotation_count: int):
 
 
 def cv2_to_qlabel(frame):
-    Image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    # FlippedImage = cv2.flip(Image, 1)
-
+    """
+    Wraps the BGR frame in a QImage without copying or swapping channels. The QImage is only a
+    view, so the caller keeps frame alive until QPixmap.fromImage has copied it
+    """
     qt_frame = QImage(
-        Image.data,
-        Image.shape[1],
-        Image.shape[0],
-        QImage.Format.Format_RGB888,
+        frame.data,
+        frame.shape[1],
+        frame.shape[0],
+        frame.strides[0],
+        QImage.Format.Format_BGR888,
     )
     return qt_frame
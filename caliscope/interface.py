@@ -5,7 +5,8 @@ from abc import ABC, abstractmethod
 import cv2
 
 
-# @dataclass(slots=True)
+# slotted to keep the per-frame allocation small, and frozen so that a published packet
+# can be handed to any number of readers (see LiveStream's double buffer) without copying
 @dataclass(frozen=True, slots=True)
 class FramePacket:
     """
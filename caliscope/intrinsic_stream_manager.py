@@ -130,7 +130,7 @@ class IntrinsicStreamManager:
         intrinsic_calibrator = self.calibrators[port]
         frame_emitter = self.frame_emitters[port]
 
-        board_corners = self.tracker.charuco.board.getChessboardCorners()
+        board_corners = self.tracker.charuco.chessboard_corners
         total_corner_count = board_corners.shape[0]
         threshold_corner_count = total_corner_count * pct_board_threshold
         threshold_corner_count = max(
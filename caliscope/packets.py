@@ -20,6 +20,7 @@ class PointPacket:
     img_loc: np.ndarray = None  # x,y position of tracked point
     obj_loc: np.ndarray = None  # x,y,z in object frame of reference; primarily for calibration
     confidence: np.ndarray = None  # may be available in some trackers..include for potentnial downstream calculations
+    sync_index: np.ndarray = None  # only when a packet pools points from many sync indices, paired with point_id
 
     @property
     def obj_loc_list(self) -> List[List]:
@@ -0,0 +1,127 @@
+"""
+Video writers that share the cv2.VideoWriter surface (write/release/isOpened) so that
+recording threads do not need to know which encoder is behind them.
+
+Hardware encoding is optional: av is not a dependency of caliscope, so when it (or a
+hardware encoder) is unavailable the CPU mp4v writer is used.
+"""
+
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import caliscope.logger
+
+logger = caliscope.logger.get(__name__)
+
+
+class PyAVVideoWriter:
+    """
+    H.264 through one of FFmpeg's hardware encoders via av. Opening the codec up front means an
+    encoder that is not usable on this machine fails here rather than on the first frame.
+    """
+
+    def __init__(self, path: Path | str, fps: int, size: tuple[int, int], codec: str):
+        import av
+
+        self._av = av
+        self.container = av.open(str(path), "w")
+        try:
+            self.stream = self.container.add_stream(codec, rate=fps)
+            self.stream.width, self.stream.height = size
+            self.stream.pix_fmt = "yuv420p"
+            self.stream.codec_context.open()
+        except Exception:
+            self.container.close()
+            raise
+        self._opened = True
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def write(self, frame: np.ndarray):
+        video_frame = self._av.VideoFrame.from_ndarray(frame, format="bgr24")
+        for packet in self.stream.encode(video_frame):
+            self.container.mux(packet)
+
+    def release(self):
+        if not self._opened:
+            return
+        for packet in self.stream.encode():  # flush frames still held by the encoder
+            self.container.mux(packet)
+        self.container.close()
+        self._opened = False
+
+
+# hardware H.264 encoders tried through av, in order of preference
+PYAV_HARDWARE_CODECS = ("h264_nvenc", "h264_videotoolbox", "h264_vaapi")
+
+# GStreamer hardware H.264 elements tried through cv2 when it was built with GStreamer
+GSTREAMER_ENCODERS = ("nvh264enc", "vaapih264enc")
+
+# then OpenCV's own writer, which may have an H.264 encoder (avc1) and always has mp4v
+CV2_FOURCCS = ("avc1", "mp4v")
+
+
+def check_frame_layout(frame: np.ndarray, size: tuple[int, int]):
+    """
+    Writers take frames as C-contiguous uint8 BGR of the size they were opened with. cv2's writer
+    silently skips frames of any other size, and its binding copies non-contiguous input on every
+    write, so recording threads check the first frame once and treat a mismatch as an upstream error.
+    """
+    width, height = size
+    expected_shape = (height, width, 3)
+    if frame.shape != expected_shape or frame.dtype != np.uint8 or not frame.flags["C_CONTIGUOUS"]:
+        raise ValueError(
+            f"Expected C-contiguous uint8 frames of shape {expected_shape}, "
+            f"got {frame.dtype} frames of shape {frame.shape}"
+        )
+
+
+def gstreamer_available() -> bool:
+    return cv2.CAP_GSTREAMER in cv2.videoio_registry.getWriterBackends()
+
+
+def gstreamer_pipeline(path: Path | str, encoder: str) -> str:
+    # quoted so that paths with spaces survive the pipeline parser
+    location = str(path).replace("\\", "\\\\").replace('"', '\\"')
+    return f'appsrc ! videoconvert ! {encoder} ! h264parse ! mp4mux ! filesink location="{location}"'
+
+
+def create_video_writer(path: Path | str, fps: int, size: tuple[int, int]):
+    """
+    Returns the first writer that opens, trying hardware encoders before software ones:
+    FFmpeg's hardware H.264 encoders (NVENC first) through av, GStreamer's through cv2, then
+    cv2 with avc1 and finally mp4v. Any of them can be used as a cv2.VideoWriter.
+    """
+    try:
+        import av  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        for codec in PYAV_HARDWARE_CODECS:
+            try:
+                writer = PyAVVideoWriter(path, fps, size, codec)
+                logger.info(f"Recording {path} with {codec}")
+                return writer
+            except Exception as e:
+                logger.info(f"{codec} writer unavailable ({e})")
+
+    if gstreamer_available():
+        for encoder in GSTREAMER_ENCODERS:
+            writer = cv2.VideoWriter(gstreamer_pipeline(path, encoder), cv2.CAP_GSTREAMER, 0, fps, size)
+            if writer.isOpened():
+                logger.info(f"Recording {path} with GStreamer {encoder}")
+                return writer
+            writer.release()
+
+    for fourcc in CV2_FOURCCS:
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if writer.isOpened():
+            logger.info(f"Recording {path} with cv2 {fourcc}")
+            return writer
+        writer.release()
+
+    # nothing opened; the caller checks isOpened() and reports the failure
+    return writer
@@ -3,23 +3,47 @@
 # This version is focused on single camera recording for Caliscope
 import caliscope.logger
 
-from PySide6.QtCore import QObject, Signal, QThread
+from PySide6.QtCore import QObject, QThread, QThreadPool, Signal
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from time import sleep
-from queue import Queue
+from time import perf_counter, sleep
 import cv2
 from datetime import datetime
 
 from caliscope.cameras.camera import Camera
-from caliscope.cameras.live_stream import LiveStream
+from caliscope.cameras.live_stream import LiveStream, SPSCFramePacketQueue
 from caliscope.gui.frame_emitters.frame_emitter import FrameEmitter
 from caliscope.configurator import Configurator
+from caliscope.recording.video_writers import check_frame_layout, create_video_writer
 
 logger = caliscope.logger.get(__name__)
 
 # Maximum number of camera ports to check when auto-detecting cameras
 MAX_CAMERA_PORT_CHECK = 10
+# ports probed at the same time
+CAMERA_PROBE_WORKERS = 4
+# how many empty ports in a row end the search early; None probes the whole range, as camera
+# indices can be sparse (unplugged cameras, v4l2 metadata nodes taking odd indices)
+MAX_CONSECUTIVE_PORT_MISSES = None
+# resolution changes run at the same time
+RESOLUTION_CHANGE_WORKERS = 2
+
+# most frames the recording worker takes from its queue in one pass
+RECORDING_BATCH_SIZE = 8
+
+class WorkerThread(QThread):
+    """
+    Dedicated thread that runs a single function, for long-lived work such as a recording
+    """
+
+    def __init__(self, fn, parent=None):
+        super().__init__(parent)
+        self.fn = fn
+
+    def run(self):
+        self.fn()
+
 
 class LiveSession(QObject):
     """
@@ -46,6 +70,7 @@ class LiveSession(QObject):
         self.stream_tools_loaded = False
         self.is_recording = False
         self.video_writer = None
+        self.dropped_frames = 0  # frames the last recording discarded because the writer was behind
 
         # Default FPS if not specified in config
         self.fps_target = self.config.get_fps_target() if hasattr(self.config, 'get_fps_target') else 30
@@ -56,8 +81,8 @@ class LiveSession(QObject):
         Shut down the streams and close the camera captures
         """
         for port, stream in self.streams.items():
-            if hasattr(stream, 'stop_event'):
-                stream.stop_event.set()
+            if hasattr(stream, 'stop'):
+                stream.stop()
         self.streams = {}
         
         for port, cam in self.cameras.items():
@@ -115,17 +140,20 @@ class LiveSession(QObject):
         """
         Count the number of configured cameras
         """
-        count = 0
-        if hasattr(self.config, 'dict'):
-            for key, params in self.config.dict.copy().items():
-                if key.startswith("cam_") and not params.get("ignore", False):
-                    count += 1
-        return count
-
-    def _find_cameras(self):
+        if not hasattr(self.config, 'dict'):
+            return 0
+        # read once from the loading thread before any camera is saved, so no copy is needed
+        return sum(
+            1 for key, params in self.config.dict.items()
+            if key.startswith("cam_") and not params.get("ignore", False)
+        )
+
+    def _find_cameras(self, max_consecutive_misses: int | None = MAX_CONSECUTIVE_PORT_MISSES):
         """
         Detect available cameras using multiple threads
         Will populate self.cameras
+
+        max_consecutive_misses: opt in to ending the search after this many empty ports in a row
         """
         def add_cam(port):
             try:
@@ -140,22 +168,45 @@ class LiveSession(QObject):
                 
                 logger.info(f"Loading stream at port {port}")
                 self.streams[port] = LiveStream(cam, fps_target=self.fps_target)
+                return True
             except Exception as e:
                 logger.warning(f"No camera at port {port}: {e}")
+                return False
 
-        with ThreadPoolExecutor() as executor:
-            for i in range(0, MAX_CAMERA_PORT_CHECK):
-                if i in self.cameras.keys():
-                    # don't try to connect to an already connected camera
-                    pass
-                else:
-                    executor.submit(add_cam, i)
+        # don't try to connect to an already connected camera
+        ports = [i for i in range(0, MAX_CAMERA_PORT_CHECK) if i not in self.cameras.keys()]
+
+        # a few probes at a time, as opening many captures at once contends for the same driver.
+        # Results are taken in port order and a new port is only submitted as one finishes, so
+        # when the search ends early the remaining ports are never probed
+        with ThreadPoolExecutor(max_workers=CAMERA_PROBE_WORKERS) as executor:
+            in_flight = deque(executor.submit(add_cam, port) for port in ports[:CAMERA_PROBE_WORKERS])
+            remaining = iter(ports[CAMERA_PROBE_WORKERS:])
+            consecutive_misses = 0
+            while in_flight:
+                found = in_flight.popleft().result()
+                consecutive_misses = 0 if found else consecutive_misses + 1
+                if max_consecutive_misses is not None and consecutive_misses >= max_consecutive_misses:
+                    logger.info(
+                        f"{consecutive_misses} empty ports in a row; ending camera search early "
+                        f"without probing ports {list(remaining)}"
+                    )
+                    break
+                port = next(remaining, None)
+                if port is not None:
+                    in_flight.append(executor.submit(add_cam, port))
 
     def load_stream_tools(self):
         """
         Load cameras, create streams and frame emitters
         """
         def worker():
+            try:
+                load()
+            finally:
+                self.stream_tools_loaded_signal.emit()
+
+        def load():
             self.stream_tools_in_process = True
             
             # Get cameras from config if available
@@ -188,11 +239,8 @@ class LiveSession(QObject):
             self.stream_tools_loaded = True
             self.stream_tools_in_process = False
 
-        # Run in a separate thread to avoid blocking the UI
-        self.load_stream_tools_thread = QThread()
-        self.load_stream_tools_thread.run = worker
-        self.load_stream_tools_thread.finished.connect(self.stream_tools_loaded_signal.emit)
-        self.load_stream_tools_thread.start()
+        # Run on a pooled thread to avoid blocking the UI; the signal is queued to receivers' threads
+        QThreadPool.globalInstance().start(worker)
 
     def unsubscribe_all_frame_emitters(self):
         """
@@ -211,9 +259,15 @@ class LiveSession(QObject):
                 emitter.subscribe()
 
     def start_recording(self, port: int, destination_directory: Path = None, 
-                       fps: int = None, codec: str = 'mp4v'):
+                       fps: int = None, codec: str = None, backpressure: str = "drop"):
         """
         Start recording from a specific camera port
+
+        codec: fourcc to record with; by default the fastest available H.264 encoder is used.
+        "FFV1" records losslessly (into an .avi container)
+
+        backpressure: "drop" discards incoming frames while the writer is behind so capture is
+        never held up; "block" makes the capture thread wait for room instead
         """
         if self.is_recording:
             logger.warning("Recording already in progress")
@@ -236,7 +290,8 @@ class LiveSession(QObject):
         
         # Create filename with timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"port_{port}_{timestamp}.mp4"
+        suffix = ".avi" if codec == "FFV1" else ".mp4"
+        filename = f"port_{port}_{timestamp}{suffix}"
         filepath = destination_directory / filename
         
         # Get stream and camera
@@ -255,25 +310,25 @@ class LiveSession(QObject):
         
         try:
             # Initialize video writer
-            self.video_writer = cv2.VideoWriter(
-                str(filepath), 
-                cv2.VideoWriter_fourcc(*codec), 
-                fps, 
-                resolution
-            )
+            if codec is None:
+                self.video_writer = create_video_writer(filepath, fps, resolution)
+            else:
+                self.video_writer = cv2.VideoWriter(str(filepath), cv2.VideoWriter_fourcc(*codec), fps, resolution)
             
             if not self.video_writer.isOpened():
                 logger.error(f"Failed to open VideoWriter for {filepath}")
                 return False
                 
-            # Create recording queue and subscribe to stream
-            self.recording_queue = Queue(maxsize=fps * 5 + 20)  # Buffer for ~5 seconds
+            # Create recording queue and subscribe to stream; the stream hands it every frame
+            self.recording_queue = SPSCFramePacketQueue(block=backpressure == "block")
             stream.subscribe(self.recording_queue)
             
             # Set recording flag
             self.is_recording = True
             self.recording_port = port
             self.recording_path = filepath
+            # the writer was opened at this size; the worker checks the first frame against it
+            self.recording_size = resolution
             
             # Start frame recording thread
             self._start_recording_thread()
@@ -297,17 +352,27 @@ class LiveSession(QObject):
             logger.info(f"Recording thread started for port {self.recording_port}")
             frames_written = 0
             
-            while self.is_recording:
+            # keep draining after a stop so that frames already queued are still saved
+            while self.is_recording or self.recording_queue.qsize() > 0:
                 try:
-                    frame_packet = self.recording_queue.get(timeout=1)
-                    if frame_packet is None:  # Sentinel value
-                        break
-                        
-                    self.video_writer.write(frame_packet.frame)
-                    frames_written += 1
+                    frame_packet = self.recording_queue.dequeue_blocking(timeout_ms=100)
+                    if frame_packet is None:  # timed out; check whether recording has stopped
+                        continue
+                    if frames_written == 0:
+                        check_frame_layout(frame_packet.frame, self.recording_size)
+
+                    # write whatever else is already queued in the same pass
+                    batch = [frame_packet]
+                    while len(batch) < RECORDING_BATCH_SIZE:
+                        frame_packet = self.recording_queue.dequeue()
+                        if frame_packet is None:
+                            break
+                        batch.append(frame_packet)
+
+                    for frame_packet in batch:
+                        self.video_writer.write(frame_packet.frame)
+                    frames_written += len(batch)
                     
-                except Queue.Empty:
-                    continue
                 except Exception as e:
                     logger.error(f"Error writing frame: {e}")
                     break
@@ -320,8 +385,7 @@ class LiveSession(QObject):
             self.is_recording = False
             self.recording_stopped_signal.emit()
             
-        self.recording_thread = QThread()
-        self.recording_thread.run = recording_worker
+        self.recording_thread = WorkerThread(recording_worker)
         self.recording_thread.start()
 
     def stop_recording(self):
@@ -334,20 +398,21 @@ class LiveSession(QObject):
             
         logger.info("Stopping recording...")
         
-        # Signal recording thread to stop
-        self.is_recording = False
-        
-        # Add sentinel value to queue
-        try:
-            self.recording_queue.put_nowait(None)
-        except Exception as e:
-            logger.warning(f"Error adding sentinel to recording queue: {e}")
-            
-        # Unsubscribe queue from stream
+        # Unsubscribe queue from stream first so nothing more arrives while the worker drains it
         if hasattr(self, 'recording_port') and self.recording_port in self.streams:
             stream = self.streams[self.recording_port]
             if hasattr(self, 'recording_queue'):
                 stream.unsubscribe(self.recording_queue)
+
+        # Signal recording thread to stop once the queue is empty
+        self.is_recording = False
+
+        if hasattr(self, 'recording_queue'):
+            # don't leave the worker waiting out its dequeue timeout before it notices
+            self.recording_queue.wake()
+            self.dropped_frames = self.recording_queue.dropped
+            if self.dropped_frames:
+                logger.warning(f"Recording dropped {self.dropped_frames} frames while the writer was behind")
                 
         return True
 
@@ -369,17 +434,22 @@ class LiveSession(QObject):
             if not size:
                 return
                 
-            default_size = self.cameras[port].default_resolution
-            
-            if size[0] != default_size[0] or size[1] != default_size[1]:
+            current_size = tuple(self.cameras[port].size)
+
+            # reconnecting is slow, so leave a camera alone that is already at the configured size
+            if tuple(size[0:2]) != current_size[0:2]:
                 logger.info(
-                    f"Beginning to change resolution at port {port} from {default_size[0:2]} to {size[0:2]}"
+                    f"Beginning to change resolution at port {port} from {current_size[0:2]} to {size[0:2]}"
                 )
+                start = perf_counter()
                 stream.change_resolution(size)
                 logger.info(
-                    f"Completed change of resolution at port {port} from {default_size[0:2]} to {size[0:2]}"
+                    f"Completed change of resolution at port {port} from {current_size[0:2]} to {size[0:2]} "
+                    f"in {perf_counter() - start:.2f}s"
                 )
 
-        with ThreadPoolExecutor() as executor:
+        # cameras sharing a USB bus reconfigure one at a time in the kernel anyway and can fail
+        # when asked concurrently, so only a couple of changes are run at once
+        with ThreadPoolExecutor(max_workers=RESOLUTION_CHANGE_WORKERS) as executor:
             for port in self.cameras.keys():
                 executor.submit(adjust_res_worker, port)
@@ -103,7 +103,7 @@ class CharucoTracker(Tracker):
         # if self.ids == np.array([0]):
         # print("wait")
         if len(ids) > 0:
-            return self.board.getChessboardCorners()[ids, :]
+            return self.charuco.get_object_corners(ids)
         else:
             return np.array([])
 
@@ -4,10 +4,11 @@ from itertools import combinations
 from pathlib import Path
 
 import numpy as np
+import pandas as pd
 
 import caliscope.logger
 from caliscope.cameras.synchronizer import Synchronizer
-from caliscope.packets import SyncPacket
+from caliscope.packets import PointPacket, SyncPacket
 
 logger = caliscope.logger.get(__name__)
 
@@ -18,25 +19,29 @@ class StereoPointsBuilder:
         self.pairs = [(i, j) for i, j in combinations(self.ports, 2) if i < j]
 
     def _get_stereo_points_packet(self, sync_index, port_A, points_A, port_B, points_B):
-        # get ids in common
-        if len(points_A.point_id) > 0 and len(points_B.point_id) > 0:
-            common_ids = np.intersect1d(points_A.point_id, points_B.point_id)
+        if points_A.sync_index is not None and points_B.sync_index is not None:
+            # points pooled across sync indices are only shared if both sync_index and point_id agree
+            shared_indices_A, shared_indices_B = _match_sync_points(points_A, points_B)
+            common_ids = points_A.point_id[shared_indices_A]
+            sync_index = points_A.sync_index[shared_indices_A]
         else:
-            common_ids = np.array([])
+            # get ids in common
+            if len(points_A.point_id) > 0 and len(points_B.point_id) > 0:
+                common_ids = np.intersect1d(points_A.point_id, points_B.point_id)
+            else:
+                common_ids = np.array([])
+
+            if len(common_ids) > 0:
+                # for both ports, get the indices of the common ids
+                sorter_A = np.argsort(points_A.point_id)
+                shared_indices_A = sorter_A[np.searchsorted(points_A.point_id, common_ids, sorter=sorter_A)]
+
+                sorter_B = np.argsort(points_B.point_id)
+                shared_indices_B = sorter_B[np.searchsorted(points_B.point_id, common_ids, sorter=sorter_B)]
 
         if len(common_ids) == 0:
             packet = None
         else:
-            # common_ids = common_ids[:,0]
-            # for both ports, get the indices of the common ids
-            sorter_A = np.argsort(points_A.point_id)
-            shared_indices_A = sorter_A[np.searchsorted(points_A.point_id, common_ids, sorter=sorter_A)]
-            shared_indices_A
-
-            sorter_B = np.argsort(points_B.point_id)
-            shared_indices_B = sorter_B[np.searchsorted(points_B.point_id, common_ids, sorter=sorter_B)]
-            shared_indices_B
-
             packet = StereoPointsPacket(
                 sync_index=sync_index,
                 port_A=port_A,
@@ -73,11 +78,25 @@ class StereoPointsBuilder:
         return SynchedStereoPointsPacket(sync_index, paired_points_packets)
 
 
+def _match_sync_points(points_A: PointPacket, points_B: PointPacket) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Row indices into points_A and points_B of the points they share, keyed on (sync_index, point_id)
+    and ordered by that key. A hash join on the two columns avoids packing them into a single integer.
+    """
+    keys_A = pd.DataFrame({"sync_index": points_A.sync_index, "point_id": points_A.point_id})
+    keys_B = pd.DataFrame({"sync_index": points_B.sync_index, "point_id": points_B.point_id})
+    keys_A["row_A"] = np.arange(len(keys_A))
+    keys_B["row_B"] = np.arange(len(keys_B))
+
+    shared = keys_A.merge(keys_B, on=["sync_index", "point_id"], sort=True)
+    return shared["row_A"].to_numpy(), shared["row_B"].to_numpy()
+
+
 @dataclass
 class StereoPointsPacket:
     """The points shared by two FramePointsPackets"""
 
-    sync_index: int
+    sync_index: int | np.ndarray  # one per common id when the points span many sync indices
 
     port_A: int
     port_B: int
@@ -94,23 +113,24 @@ class StereoPointsPacket:
         return (self.port_A, self.port_B)
 
     def to_table(self):
-        # table will be in the form of a dictionary of lists of equal length
+        # table will be in the form of a dictionary of equal length columns
+        # "pair" is a list of tuples; all other columns are numpy arrays
         table = {}
 
         point_count = len(self.common_ids)
 
         table["pair"] = [self.pair] * point_count
-        table["port_A"] = [self.port_A] * point_count
-        table["port_B"] = [self.port_B] * point_count
-        table["sync_index"] = [self.sync_index] * point_count
-        table["point_id"] = list(self.common_ids)
-        table["x_pos"] = list(self.xyz[:, 0])
-        table["y_pos"] = list(self.xyz[:, 1])
-        table["z_pos"] = list(self.xyz[:, 2])
-        table["x_A"] = list(self.img_loc_A[:, 0])
-        table["y_A"] = list(self.img_loc_A[:, 1])
-        table["x_B"] = list(self.img_loc_B[:, 0])
-        table["y_B"] = list(self.img_loc_B[:, 1])
+        table["port_A"] = np.full(point_count, self.port_A)
+        table["port_B"] = np.full(point_count, self.port_B)
+        table["sync_index"] = np.broadcast_to(self.sync_index, point_count).copy()
+        table["point_id"] = self.common_ids
+        table["x_pos"] = self.xyz[:, 0]
+        table["y_pos"] = self.xyz[:, 1]
+        table["z_pos"] = self.xyz[:, 2]
+        table["x_A"] = self.img_loc_A[:, 0]
+        table["y_A"] = self.img_loc_A[:, 1]
+        table["x_B"] = self.img_loc_B[:, 0]
+        table["y_B"] = self.img_loc_B[:, 1]
 
         return table
 
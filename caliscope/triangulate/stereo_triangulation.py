@@ -0,0 +1,193 @@
+import numpy as np
+from numba import njit, prange
+
+import caliscope.logger
+
+logger = caliscope.logger.get(__name__)
+
+
+# Pairwise (stereo) triangulation of every camera pair across many sync indices at once.
+# Inputs are flat, typed arrays rather than per sync index packets so that the whole
+# block of point data can be handled in compiled code. Rows must be sorted by
+# (sync_index, port_index, point_id); sync_starts/sync_stops delimit each sync index.
+
+
+@njit(cache=True)
+def _port_run(port_index, start, stop, port):
+    """
+    Rows of a sync index are sorted by port, so the rows of one port are a contiguous run
+    """
+    run_start = start
+    while run_start < stop and port_index[run_start] < port:
+        run_start += 1
+    run_stop = run_start
+    while run_stop < stop and port_index[run_stop] == port:
+        run_stop += 1
+    return run_start, run_stop
+
+
+@njit(cache=True)
+def _count_common_points(point_id, a_start, a_stop, b_start, b_stop):
+    count = 0
+    a = a_start
+    b = b_start
+    while a < a_stop and b < b_stop:
+        if point_id[a] == point_id[b]:
+            count += 1
+            a += 1
+            b += 1
+        elif point_id[a] < point_id[b]:
+            a += 1
+        else:
+            b += 1
+    return count
+
+
+@njit(cache=True)
+def _triangulate_point(xy_A, xy_B, proj_A, proj_B):
+    """
+    Direct linear transform of a single point seen by two cameras (as in cv2.triangulatePoints)
+    """
+    A = np.empty((4, 4), dtype=xy_A.dtype)
+    A[0] = xy_A[0] * proj_A[2] - proj_A[0]
+    A[1] = xy_A[1] * proj_A[2] - proj_A[1]
+    A[2] = xy_B[0] * proj_B[2] - proj_B[0]
+    A[3] = xy_B[1] * proj_B[2] - proj_B[1]
+    u, s, vh = np.linalg.svd(A)
+    xyzw = vh[-1]
+    return xyzw[:3] / xyzw[3]
+
+
+@njit(parallel=True, cache=True)
+def stereo_triangulate_all(sync_starts, sync_stops, port_index, point_id, img_xy, projection_matrices, pair_table):
+    """
+    sync_starts, sync_stops: (S,) int64 row bounds of each sync index
+    port_index: (N,) int64 index of each row's camera into projection_matrices
+    point_id: (N,) int64
+    img_xy: (N,2) float32 or float64 undistorted image points
+    projection_matrices: (P,3,4) of the same dtype as img_xy
+    pair_table: (K,2) int64 port indices of each camera pair
+
+    returns the input rows of each stereo point for port A and port B, the index of its
+    pair in pair_table and its triangulated xyz position (in the dtype of img_xy). Output is ordered by
+    sync index, then pair, then point_id.
+    """
+    sync_count = len(sync_starts)
+    pair_count = len(pair_table)
+
+    # first pass counts the points in common so that the output can be allocated once
+    counts = np.zeros(sync_count * pair_count, dtype=np.int64)
+    for s in prange(sync_count):
+        for k in range(pair_count):
+            a_start, a_stop = _port_run(port_index, sync_starts[s], sync_stops[s], pair_table[k, 0])
+            b_start, b_stop = _port_run(port_index, sync_starts[s], sync_stops[s], pair_table[k, 1])
+            counts[s * pair_count + k] = _count_common_points(point_id, a_start, a_stop, b_start, b_stop)
+
+    offsets = np.zeros(sync_count * pair_count + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    total = offsets[-1]
+
+    row_A = np.empty(total, dtype=np.int64)
+    row_B = np.empty(total, dtype=np.int64)
+    pair = np.empty(total, dtype=np.int64)
+    xyz = np.empty((total, 3), dtype=img_xy.dtype)
+
+    for s in prange(sync_count):
+        for k in range(pair_count):
+            cursor = offsets[s * pair_count + k]
+            if counts[s * pair_count + k] == 0:
+                continue
+
+            proj_A = projection_matrices[pair_table[k, 0]]
+            proj_B = projection_matrices[pair_table[k, 1]]
+            a, a_stop = _port_run(port_index, sync_starts[s], sync_stops[s], pair_table[k, 0])
+            b, b_stop = _port_run(port_index, sync_starts[s], sync_stops[s], pair_table[k, 1])
+
+            while a < a_stop and b < b_stop:
+                if point_id[a] == point_id[b]:
+                    row_A[cursor] = a
+                    row_B[cursor] = b
+                    pair[cursor] = k
+                    xyz[cursor] = _triangulate_point(img_xy[a], img_xy[b], proj_A, proj_B)
+                    cursor += 1
+                    a += 1
+                    b += 1
+                elif point_id[a] < point_id[b]:
+                    a += 1
+                else:
+                    b += 1
+
+    return row_A, row_B, pair, xyz
+
+
+# below this many points the transfer to and from the GPU costs more than it saves
+CUDA_MIN_BATCH = 10_000
+
+
+def triangulate_stereo_batch(
+    xy_A: np.ndarray, xy_B: np.ndarray, proj_A: np.ndarray, proj_B: np.ndarray, backend: str = "cpu"
+) -> np.ndarray:
+    """
+    Vectorized direct linear transform for a batch of stereo correspondences.
+
+    xy_A, xy_B: (N,2) undistorted image points of the two cameras
+    proj_A, proj_B: projection matrices of the two cameras, either (3,4) or one per point (N,3,4)
+    backend: "cpu" or "cuda"; the latter solves large batches on the GPU via torch when available
+
+    The (N,4,4) system of every point is stacked and solved with a single batched
+    SVD in the precision of the inputs (float32 inputs are solved in float32).
+    Returns the (N,3) euclidean positions.
+    """
+    A = np.empty((len(xy_A), 4, 4), dtype=np.result_type(xy_A, xy_B, proj_A, proj_B))
+    A[:, 0] = xy_A[:, 0, None] * proj_A[..., 2, :] - proj_A[..., 0, :]
+    A[:, 1] = xy_A[:, 1, None] * proj_A[..., 2, :] - proj_A[..., 1, :]
+    A[:, 2] = xy_B[:, 0, None] * proj_B[..., 2, :] - proj_B[..., 0, :]
+    A[:, 3] = xy_B[:, 1, None] * proj_B[..., 2, :] - proj_B[..., 1, :]
+
+    xyzw = None
+    if backend == "cuda" and len(A) > CUDA_MIN_BATCH:
+        xyzw = _null_vectors_cuda(A)
+
+    if xyzw is None:
+        _, _, vh = np.linalg.svd(A)
+        xyzw = vh[:, -1, :]
+
+    return xyzw[:, :3] / xyzw[:, 3:]
+
+
+def batched_triangulate(
+    xy_A: np.ndarray, xy_B: np.ndarray, pair_index: np.ndarray, P_pairs: np.ndarray, backend: str = "cpu"
+) -> np.ndarray:
+    """
+    Triangulate correspondences from any mix of camera pairs in one batched call.
+
+    xy_A, xy_B: (N,2) undistorted image points of the first and second camera of each pair
+    pair_index: (N,) index of each point's camera pair into P_pairs
+    P_pairs: (num_pairs,2,3,4) projection matrices of the two cameras of each pair
+
+    Returns the (N,3) euclidean positions.
+    """
+    P = np.take(P_pairs, pair_index, axis=0)
+    return triangulate_stereo_batch(xy_A, xy_B, P[:, 0], P[:, 1], backend=backend)
+
+
+def _null_vectors_cuda(A: np.ndarray) -> np.ndarray | None:
+    """
+    Last right singular vector of each matrix in A, computed with torch on a CUDA device.
+    torch is not a dependency of caliscope, so returns None when it (or a device) is unavailable
+    """
+    try:
+        import torch
+    except ImportError:
+        logger.warning("CUDA triangulation requested but torch is not installed; falling back to CPU")
+        return None
+
+    if not torch.cuda.is_available():
+        logger.warning("CUDA triangulation requested but no CUDA device is available; falling back to CPU")
+        return None
+
+    logger.info(f"Triangulating {len(A)} points on the GPU")
+    # single precision keeps the batched solve fast on consumer GPUs
+    A_gpu = torch.from_numpy(A.astype(np.float32)).cuda()
+    _, _, vh = torch.linalg.svd(A_gpu, full_matrices=False)
+    return vh[:, -1, :].cpu().numpy().astype(A.dtype)